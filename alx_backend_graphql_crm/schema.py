@@ -1,6 +1,13 @@
 import graphene
+from graphql_crm.schema import Query as CRMQuery, Mutation as CRMMutation, Subscription as CRMSubscription
 
-class Query(graphene.ObjectType):
+class Query(CRMQuery, graphene.ObjectType):
     hello = graphene.String(default_value="Hello, GraphQL!")
 
-schema = graphene.Schema(query=Query)
+class Mutation(CRMMutation, graphene.ObjectType):
+    pass
+
+class Subscription(CRMSubscription, graphene.ObjectType):
+    pass
+
+schema = graphene.Schema(query=Query, mutation=Mutation, subscription=Subscription)
@@ -1,3 +1,5 @@
+import os
+
 INSTALLED_APPS = [
     # default Django apps...
     'django.contrib.admin',
@@ -16,3 +18,66 @@ INSTALLED_APPS = [
 GRAPHENE = {
     'SCHEMA': 'alx_backend_graphql_crm.schema.schema'
 }
+
+# Largest page a connection field (allCustomers, allOrders, ...) may return
+CRM_MAX_PAGE_SIZE = 100
+
+# Rows per UPDATE when restocking low-stock products
+CRM_RESTOCK_CHUNK_SIZE = 500
+
+# Parsed and validated GraphQL documents kept in the per-process LRU
+CRM_DOCUMENT_CACHE_SIZE = 256
+
+# Background jobs run GraphQL documents in-process ("local") or over HTTP ("http")
+CRM_GRAPHQL_TRANSPORT = "local"
+
+# Rows the customers/products/orders lists may return, filtered or not (None: no limit)
+CRM_LIST_LIMIT = 1000
+
+# Cache alias holding product lookups, and how long an entry may live (seconds)
+CRM_PRODUCT_CACHE_ALIAS = "default"
+CRM_PRODUCT_CACHE_TIMEOUT = 300
+
+# Per-operation budgets checked before execution (None disables a check).
+# Cost counts the objects a query may resolve: lists multiply their
+# selection by ``first``, CRM_LIST_LIMIT (root lists) or CRM_QUERY_LIST_SIZE.
+CRM_MAX_QUERY_DEPTH = 10
+CRM_MAX_QUERY_COST = 10000
+CRM_QUERY_LIST_SIZE = 50
+
+# Share of GraphQL requests traced per resolver into /graphql/stats; requests
+# sending the header are always traced and get the trace in extensions.tracing
+CRM_TRACE_SAMPLE_RATE = 0.01
+CRM_TRACE_HEADER = "X-CRM-Trace"
+
+# Rows fetched per database round trip by the streaming /export/ endpoints
+CRM_EXPORT_CHUNK_SIZE = 2000
+
+# Threads (and DB connections) per process used by the async /graphql/async view
+CRM_ASYNC_DB_THREADS = 8
+
+# Broker behind orderCreated/stockBelowThreshold subscriptions. The in-memory
+# one only reaches subscribers in the same process.
+CRM_EVENT_BROKER = "crm.events.InMemoryBroker"
+
+# Stock level under which product changes are published as events
+CRM_LOW_STOCK_THRESHOLD = 10
+
+# Seconds timestamp watermarks of the incremental jobs stay behind each run,
+# so rows committed while a run reads are picked up by the next one
+CRM_JOB_WATERMARK_LAG = 60
+
+# Days recomputed per transaction when rebuilding the DailySales rollup
+CRM_SALES_REBUILD_DAYS = 31
+
+# Rows per chunk task of the Celery batch workflows (crm/tasks.py), and
+# attempts per chunk after database errors
+CRM_TASK_CHUNK_SIZE = 1000
+CRM_TASK_MAX_RETRIES = 5
+
+# Reminder chunks each worker may start (Celery rate limit syntax)
+CRM_REMINDER_RATE_LIMIT = "30/m"
+
+# Bearer token that lets non-staff clients (the cron jobs over HTTP) run the
+# job-control operations: updateCrmReport, recordJobRun and jobState
+CRM_JOB_TOKEN = os.environ.get("CRM_JOB_TOKEN")
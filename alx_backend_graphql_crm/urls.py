@@ -16,7 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+
+from crm.views import AsyncCRMGraphQLView, CRMGraphQLView, export, graphql_stats, graphql_subscriptions
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('graphql', csrf_exempt(CRMGraphQLView.as_view(graphiql=True))),
+    path('graphql/async', csrf_exempt(AsyncCRMGraphQLView.as_view())),
+    path('graphql/stats', graphql_stats),
+    path('graphql/subscriptions', graphql_subscriptions),
+    path('export/<slug:resource>.<slug:fmt>', export),
 ]
@@ -0,0 +1,169 @@
+"""
+Load-test the sync WSGI view (/graphql) against the async ASGI view
+(/graphql/async) at high concurrency.
+
+Usage:
+    python benchmarks/async_view.py [--concurrency 64] [--requests 640] [--threads 8] [--db-latency 5]
+
+Both stacks are driven in-process through the project's wsgi.py and
+asgi.py applications, with --concurrency clients each sending requests
+back to back. WSGI serves them with --threads worker threads (a threaded
+server); ASGI runs one task per client on a single event loop, with
+CRM_ASYNC_DB_THREADS threads for the database work.
+Latencies include the time a request waits for a free WSGI thread. The
+sync view is also run under ASGI, to separate the cost of the ASGI stack
+from the effect of the async view.
+
+--db-latency adds a sleep to every SQL statement to stand in for the
+network round trip to a database server; local SQLite has almost none.
+--conn-max-age sets CONN_MAX_AGE: with 0 every WSGI request and every
+async root field opens its own connection.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+
+from alx_backend_graphql_crm.asgi import application as asgi_application
+from alx_backend_graphql_crm.wsgi import application as wsgi_application
+from django.conf import settings
+from django.db.backends import utils
+
+from crm.async_execution import ASYNC_DB_THREADS
+
+# Sibling root fields, each doing its own queries
+QUERY = json.dumps({
+    "query": """
+        query {
+            customers(email: "customer1@example.com") { name }
+            allOrders(first: 20) { edges { node { id customer { email } } } }
+            allProducts(first: 20, stock_Lt: 10) { edges { node { name stock } } }
+        }
+    """
+}).encode()
+
+
+def add_db_latency(seconds):
+    execute = utils.CursorWrapper._execute
+
+    def delayed(self, *args, **kwargs):
+        time.sleep(seconds)
+        return execute(self, *args, **kwargs)
+
+    utils.CursorWrapper._execute = delayed
+
+
+def wsgi_call(path, server_threads=None):
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": path,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "CONTENT_TYPE": "application/json",
+        "CONTENT_LENGTH": str(len(QUERY)),
+        "wsgi.input": BytesIO(QUERY),
+        "wsgi.url_scheme": "http",
+    }
+    status = []
+    start = time.perf_counter()
+    with server_threads or threading.Lock():
+        body = b"".join(wsgi_application(environ, lambda s, headers: status.append(s)))
+    assert status[0].startswith("200"), body
+    return time.perf_counter() - start
+
+
+async def asgi_call(path):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(QUERY)).encode())],
+        "server": ("localhost", 80),
+    }
+    messages = [{"type": "http.request", "body": QUERY, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    start = time.perf_counter()
+    await asgi_application(scope, receive, send)
+    assert sent[0]["status"] == 200, sent
+    return time.perf_counter() - start
+
+
+def run_wsgi(concurrency, threads, requests):
+    # One thread per client; only ``threads`` of them are served at a time
+    server_threads = threading.BoundedSemaphore(threads)
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        start = time.perf_counter()
+        latencies = list(clients.map(lambda _: wsgi_call("/graphql", server_threads), range(requests)))
+        return latencies, time.perf_counter() - start
+
+
+async def run_asgi(concurrency, requests, path="/graphql/async"):
+    remaining = iter(range(requests))
+    latencies = []
+
+    async def client():
+        for _ in remaining:
+            latencies.append(await asgi_call(path))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+def report(label, latencies, elapsed):
+    latencies = sorted(latency * 1000 for latency in latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{label:>9}: {len(latencies) / elapsed:7.1f} req/s, "
+        f"mean {statistics.fmean(latencies):7.1f}ms, p50 {statistics.median(latencies):7.1f}ms, p95 {p95:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=640)
+    parser.add_argument("--threads", type=int, default=ASYNC_DB_THREADS, help="WSGI worker threads.")
+    parser.add_argument("--db-latency", type=float, default=5.0, help="Milliseconds added per SQL statement.")
+    parser.add_argument("--conn-max-age", type=int, default=60)
+    args = parser.parse_args()
+
+    settings.DATABASES["default"]["CONN_MAX_AGE"] = args.conn_max_age
+
+    if args.db_latency:
+        add_db_latency(args.db_latency / 1000)
+
+    # Warm both stacks (connections, document cache)
+    wsgi_call("/graphql")
+    asyncio.run(asgi_call("/graphql/async"))
+
+    report("wsgi", *run_wsgi(args.concurrency, args.threads, args.requests))
+    report("asgi", *asyncio.run(run_asgi(args.concurrency, args.requests)))
+    # The sync view under ASGI: the ASGI stack's own cost, without concurrent fields
+    report("asgi-sync", *asyncio.run(run_asgi(args.concurrency, args.requests, "/graphql")))
+
+
+if __name__ == "__main__":
+    main()
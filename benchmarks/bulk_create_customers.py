@@ -0,0 +1,87 @@
+"""
+Compare the per-row BulkCreateCustomers loop with the set-based bulk path.
+
+Usage: python benchmarks/bulk_create_customers.py [--rows 10000]
+
+Each run happens inside a transaction that is rolled back, so the
+configured database is left untouched.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+
+import django
+
+django.setup()
+
+from django.db import connection, transaction
+
+from crm.bulk import bulk_create_customers
+from crm.models import Customer
+
+PHONE_RE = re.compile(r"^(\+\d{10,15}|\d{3}-\d{3}-\d{4})$")
+
+
+def make_rows(count):
+    rows = []
+    for i in range(count):
+        phone = "123-456-7890" if i % 10 else "bad-phone"
+        rows.append({"name": f"Bench {i}", "email": f"bench{i}@example.com", "phone": phone})
+    # A few in-batch duplicates
+    rows.extend(rows[: count // 100])
+    return rows
+
+
+def loop_create(rows):
+    created = []
+    for row in rows:
+        if Customer.objects.filter(email=row["email"]).exists():
+            continue
+        if row["phone"] and not re.match(PHONE_RE.pattern, row["phone"]):
+            continue
+        customer = Customer(name=row["name"], email=row["email"], phone=row["phone"])
+        customer.save()
+        created.append(customer)
+    return created
+
+
+def bulk_create(rows):
+    created, _ = bulk_create_customers(rows, PHONE_RE)
+    return created
+
+
+def run(label, fn, rows):
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with transaction.atomic(), connection.execute_wrapper(count):
+        start = time.perf_counter()
+        created = fn(rows)
+        elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+    print(f"{label:>5}: {len(created)} created in {elapsed:.3f}s, {queries} queries")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    loop = run("loop", loop_create, rows)
+    bulk = run("bulk", bulk_create, rows)
+    print(f"speed-up: {loop / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
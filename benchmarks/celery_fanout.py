@@ -0,0 +1,112 @@
+"""
+Wall time of the chunked reminders workflow with 1, 2 and 4 Celery
+worker processes, next to running every chunk eagerly in this process.
+
+Usage:
+    python manage.py seed_crm --customers 100000 --orders 1000000
+    python benchmarks/celery_fanout.py [--chunk-size 100] [--delivery 0.01] [--workers 1 2 4]
+
+Workers are started by this script with the filesystem broker and result
+backend under a temporary directory, so no Redis is needed. Each reminder
+sleeps for --delivery seconds in place of sending it, and the reminder
+rate limit is lifted. Every run takes the full 7-day window and records
+its chunks under a new run id.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+
+import django
+
+django.setup()
+
+from celery import current_app
+
+from crm import tasks
+
+send_reminder = tasks.send_reminder
+
+
+def configure(data, delivery):
+    queue, results = os.path.join(data, "queue"), os.path.join(data, "results")
+    os.makedirs(queue, exist_ok=True)
+    os.makedirs(results, exist_ok=True)
+    tasks.BATCH_LOG = os.path.join(data, "batch.log")
+    tasks.REMINDERS_LOG = os.path.join(data, "reminders.log")
+
+    def slow_reminder(order_id, email):
+        time.sleep(delivery)
+        return send_reminder(order_id, email)
+
+    tasks.send_reminder = slow_reminder
+    current_app.conf.update(
+        broker_url="filesystem://",
+        broker_transport_options={
+            "data_folder_in": queue, "data_folder_out": queue, "control_folder": os.path.join(data, "control"),
+        },
+        result_backend=f"file://{results}",
+        result_chord_retry_interval=0.1,
+    )
+
+
+def worker(args):
+    configure(args.data, args.delivery)
+    tasks.reminder_chunk.rate_limit = None
+    current_app.worker_main(
+        ["worker", "--pool", "prefork", "--concurrency", str(args.processes), "--loglevel", "WARNING"]
+    )
+
+
+def run_workflow():
+    start = time.perf_counter()
+    result = tasks.reminders_workflow(full=True).delay().get(timeout=600, interval=0.05)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunk-size", type=int, default=100, help="customers per chunk task")
+    parser.add_argument("--delivery", type=float, default=0.01, help="time per reminder (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--processes", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    tasks.TASK_CHUNK_SIZE = args.chunk_size
+
+    if args.worker:
+        return worker(args)
+
+    with tempfile.TemporaryDirectory() as data:
+        configure(data, args.delivery)
+        current_app.conf.task_always_eager = True
+        result, elapsed = run_workflow()
+        print(f"eager      : {result['chunks']} chunks, {result.get('reminded', 0)} reminders in {elapsed:.2f}s")
+        current_app.conf.task_always_eager = False
+
+        for processes in args.workers:
+            command = [
+                sys.executable, os.path.abspath(__file__), "--worker", "--processes", str(processes),
+                "--data", data, "--chunk-size", str(args.chunk_size), "--delivery", str(args.delivery),
+            ]
+            process = subprocess.Popen(command)
+            try:
+                run_workflow()  # wait for the worker to come up
+                result, elapsed = run_workflow()
+            finally:
+                process.terminate()
+                process.wait()
+            print(
+                f"{processes} worker{'s' if processes > 1 else ' '} : {result['chunks']} chunks, "
+                f"{result.get('reminded', 0)} reminders in {elapsed:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Replay the queries sent by the cron jobs, the Celery report and the main
+mutations through the /graphql view, and report latency percentiles,
+throughput and SQL queries per operation.
+
+Usage:
+    python manage.py seed_crm --customers 100000 --orders 1000000
+    python benchmarks/crm_suite.py [--iterations 50] [--save baseline.json]
+    python benchmarks/crm_suite.py --compare baseline.json [--tolerance 0.25]
+
+Mutations run inside a transaction that is rolled back, so the data set
+is the same for every iteration and every run. The incremental jobs start
+from watermarks set just before the run (an empty delta); their full
+rebuilds are measured next to them. --compare exits with
+status 1 when a scenario's p95 latency grew by more than --tolerance or
+it issues more queries than in the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+from graphql import print_ast
+
+from crm.cron import LOW_STOCK_MUTATION
+from crm.cron_jobs.send_order_reminders import PAGE_SIZE, RECENT_ORDERS
+from crm.jobs import RESTOCK_JOB, crm_report, job_state
+from crm.models import Customer, Order, OrderItem, Product
+from crm.tasks import CRM_REPORT_MUTATION
+
+# Unsaved staff user on every request, for the job-control scenarios
+BENCH_USER = User(username="crm-suite", is_staff=True)
+
+CRM_STATS = "query { crmStats { customerCount orderCount revenue } }"
+
+CREATE_ORDER = """
+    mutation ($customerId: ID!, $items: [OrderItemInput]) {
+        createOrder(customerId: $customerId, items: $items) {
+            order { id totalAmount }
+        }
+    }
+"""
+
+CREATE_CUSTOMER = """
+    mutation ($name: String!, $email: String!) {
+        createCustomer(name: $name, email: $email) { customer { id } }
+    }
+"""
+
+
+def scenarios():
+    """``name -> (query, variables(iteration), rolled_back)``."""
+    customers = list(Customer.objects.order_by("pk").values_list("pk", flat=True)[:1000])
+    products = list(Product.objects.filter(stock__gte=5).order_by("pk").values_list("pk", flat=True)[:1000])
+    if not customers or len(products) < 3:
+        raise SystemExit("Seed the database first: python manage.py seed_crm")
+    since = (timezone.now() - timedelta(days=7)).isoformat()
+
+    # Watermarks as left by a previous run of each job
+    crm_report()
+    with job_state(RESTOCK_JOB) as state:
+        state.last_timestamp, state.totals = timezone.now(), {"threshold": 10}
+
+    def order_items(i):
+        return [{"productId": products[(i * 3 + k) % len(products)], "quantity": 1} for k in range(3)]
+
+    return {
+        "reminders.recent_orders": (
+            print_ast(RECENT_ORDERS.document),
+            lambda i: {"since": since, "first": PAGE_SIZE, "after": None},
+            False,
+        ),
+        "report.crm_stats": (CRM_STATS, lambda i: {}, False),
+        "report.incremental": (print_ast(CRM_REPORT_MUTATION.document), lambda i: {"full": False}, True),
+        "report.full": (print_ast(CRM_REPORT_MUTATION.document), lambda i: {"full": True}, True),
+        "cron.update_low_stock": (print_ast(LOW_STOCK_MUTATION.document), lambda i: {"incremental": True}, True),
+        "cron.update_low_stock.full": (
+            print_ast(LOW_STOCK_MUTATION.document), lambda i: {"incremental": False}, True
+        ),
+        "mutation.create_order": (
+            CREATE_ORDER,
+            lambda i: {"customerId": customers[i % len(customers)], "items": order_items(i)},
+            True,
+        ),
+        "mutation.create_customer": (
+            CREATE_CUSTOMER,
+            lambda i: {"name": "Bench", "email": f"bench-{i}-{time.time_ns()}@example.com"},
+            True,
+        ),
+    }
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(view, factory, query, variables, rolled_back, iterations, warmup):
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    def call(i):
+        body = json.dumps({"query": query, "variables": variables(i)})
+        request = factory.post("/graphql", body, content_type="application/json")
+        # The report scenarios are job-control operations
+        request.user = BENCH_USER
+        if rolled_back:
+            with transaction.atomic():
+                response = view(request)
+                transaction.set_rollback(True)
+        else:
+            response = view(request)
+        result = json.loads(response.content)
+        if result.get("errors"):
+            raise SystemExit(f"{query.split()[0]} failed: {result['errors'][0]['message']}")
+
+    for i in range(warmup):
+        call(i)
+
+    latencies = []
+    with connection.execute_wrapper(count):
+        started = time.perf_counter()
+        for i in range(warmup, warmup + iterations):
+            start = time.perf_counter()
+            call(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "ops_per_s": round(iterations / elapsed, 1),
+        # Rolled-back mutations also count their SAVEPOINT/ROLLBACK statements
+        "queries": round(queries / iterations, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", action="append", help="Run only this scenario (repeatable).")
+    parser.add_argument("--save", help="Write the results as a baseline JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file to check the results against.")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    view = resolve("/graphql").func
+    factory = RequestFactory()
+    dataset = {
+        "customers": Customer.objects.count(),
+        "products": Product.objects.count(),
+        "orders": Order.objects.count(),
+        "order_items": OrderItem.objects.count(),
+    }
+    print(", ".join(f"{count} {name}" for name, count in dataset.items()))
+    print(f"{'scenario':<26}{'p50':>9}{'p95':>9}{'p99':>9}{'ops/s':>9}{'queries':>9}")
+
+    results = {}
+    for name, (query, variables, rolled_back) in scenarios().items():
+        if args.only and name not in args.only:
+            continue
+        result = results[name] = run_scenario(
+            view, factory, query, variables, rolled_back, args.iterations, args.warmup
+        )
+        print(
+            f"{name:<26}{result['p50_ms']:>8.2f}ms{result['p95_ms']:>7.2f}ms{result['p99_ms']:>7.2f}ms"
+            f"{result['ops_per_s']:>9.1f}{result['queries']:>9.2f}"
+        )
+
+    if args.save:
+        baseline = {
+            "dataset": dataset,
+            "environment": {
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "iterations": args.iterations,
+            },
+            "scenarios": results,
+        }
+        with open(args.save, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("dataset") != dataset:
+            print("Warning: the baseline was recorded on a different data set.")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
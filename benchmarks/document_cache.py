@@ -0,0 +1,80 @@
+"""
+Measure the parse/validate time the document cache saves per request.
+
+Usage: python benchmarks/document_cache.py [--iterations 2000]
+
+Replays the queries sent by the cron jobs and the Celery report against
+the project schema, once with a fresh parse/validate per call and once
+through the document cache.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+
+import django
+
+django.setup()
+
+from graphql import parse
+from graphql.validation import validate
+
+from alx_backend_graphql_crm.schema import schema
+from crm.documents import DocumentCache, get_document
+
+QUERIES = {
+    "report": "query { crmStats { customerCount orderCount revenue } }",
+    "reminders": """
+        query GetRecentOrders {
+            orders {
+                id
+                customer { email }
+            }
+        }
+    """,
+    "restock": """
+        mutation {
+            updateLowStockProducts {
+                success
+                products { name stock }
+            }
+        }
+    """,
+}
+
+
+def uncached(graphql_schema, query):
+    document = parse(query)
+    assert not validate(graphql_schema, document)
+
+
+def cached(graphql_schema, query, cache):
+    document, errors = get_document(graphql_schema, query, cache=cache)
+    assert document is not None and not errors
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    graphql_schema = schema.graphql_schema
+    for name, query in QUERIES.items():
+        cache = DocumentCache()
+        before = timed(lambda: uncached(graphql_schema, query), args.iterations)
+        after = timed(lambda: cached(graphql_schema, query, cache), args.iterations)
+        print(f"{name:>10}: {before:8.1f}us -> {after:6.1f}us per request (saved {before - after:.1f}us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Many concurrent order creations against a small set of hot products.
+
+Usage: python benchmarks/order_contention.py [--threads 16] [--orders 50] [--products 3]
+
+Each thread places orders through crm.orders.place_order with random
+quantities. The run reports throughput, accepted and oversold orders, and
+checks that stock never went negative and matches the units sold.
+Everything it creates is deleted afterwards. Use a server database
+(PostgreSQL/MySQL) for meaningful numbers; SQLite serialises writers.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
+
+import django
+
+django.setup()
+
+from django.db import connection
+from django.db.models import Sum
+from graphql import GraphQLError
+
+from crm.models import Customer, OrderItem, Product
+from crm.orders import place_order
+
+
+def worker(customer, products, orders, results, seed):
+    rng = random.Random(seed)
+    try:
+        for _ in range(orders):
+            lines = rng.sample(products, rng.randint(1, len(products)))
+            quantities = {p.pk: rng.randint(1, 3) for p in lines}
+            try:
+                place_order(customer, quantities)
+                results["accepted"] += 1
+            except GraphQLError:
+                results["oversold"] += 1
+            except Exception as e:
+                results[type(e).__name__] += 1
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=50, help="orders per thread")
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=500)
+    args = parser.parse_args()
+
+    products = [
+        Product.objects.create(name=f"bench-hot-{i}", price=Decimal("9.99"), stock=args.stock)
+        for i in range(args.products)
+    ]
+    customers = [
+        Customer.objects.create(name=f"bench-{i}", email=f"bench-contention-{i}@example.com")
+        for i in range(args.threads)
+    ]
+
+    results = Counter()
+    threads = [
+        threading.Thread(target=worker, args=(customer, products, args.orders, results, i))
+        for i, customer in enumerate(customers)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    try:
+        total = args.threads * args.orders
+        print(f"{total} orders in {elapsed:.2f}s ({total / elapsed:,.0f} orders/s): {dict(results)}")
+        for product in Product.objects.filter(pk__in=[p.pk for p in products]):
+            sold = OrderItem.objects.filter(product=product).aggregate(units=Sum("quantity"))["units"] or 0
+            consistent = product.stock >= 0 and product.stock + sold == args.stock
+            print(f"{product.name}: sold {sold}, left {product.stock}, consistent={consistent}")
+    finally:
+        Customer.objects.filter(pk__in=[c.pk for c in customers]).delete()
+        Product.objects.filter(pk__in=[p.pk for p in products]).delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Throughput of the async order-reminder pipeline against a local stub server.
+
+Usage: python benchmarks/order_reminders.py [--orders 5000] [--customers 1000]
+
+The stub answers allOrders pages with synthetic data after a fixed
+latency, and each reminder sleeps for a fixed delivery time, so the
+numbers show how far concurrency overlaps network waits.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web
+from gql import Client
+from gql.transport.aiohttp import AIOHTTPTransport
+
+from crm.cron_jobs.send_order_reminders import send_reminders
+from crm.graphql_client import load_schema
+
+
+def stub_app(orders, customers, latency):
+    async def graphql(request):
+        await asyncio.sleep(latency)
+        variables = (await request.json())["variables"]
+        start = int(variables["after"] or 0)
+        end = min(start + variables["first"], orders)
+        edges = [
+            {"node": {"id": str(i), "customer": {"email": f"c{i % customers}@example.com"}}}
+            for i in range(start, end)
+        ]
+        page_info = {"hasNextPage": end < orders, "endCursor": str(end)}
+        return web.json_response({"data": {"allOrders": {"edges": edges, "pageInfo": page_info}}})
+
+    app = web.Application()
+    app.router.add_post("/graphql", graphql)
+    return app
+
+
+async def run(url, concurrency, delivery):
+    async def remind(order_id, email):
+        await asyncio.sleep(delivery)
+
+    client = Client(transport=AIOHTTPTransport(url=url), schema=load_schema())
+    start = time.perf_counter()
+    async with client as session:
+        reminded = await send_reminders(session, "2024-01-01T00:00:00+00:00", remind, concurrency)
+    return reminded, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.005, help="stub response time (s)")
+    parser.add_argument("--delivery", type=float, default=0.01, help="time per reminder (s)")
+    args = parser.parse_args()
+
+    runner = web.AppRunner(stub_app(args.orders, args.customers, args.latency))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/graphql"
+
+    try:
+        for concurrency in (1, 5, 20, 50):
+            reminded, elapsed = await run(url, concurrency, args.delivery)
+            print(
+                f"concurrency {concurrency:>3}: {reminded} reminders in {elapsed:.2f}s "
+                f"({args.orders / elapsed:,.0f} orders/s, {reminded / elapsed:,.0f} reminders/s)"
+            )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from graphql import ExecutionContext, OperationType
+
+# Worker threads (and so at most this many DB connections) per process
+# for the async GraphQL view
+ASYNC_DB_THREADS = getattr(settings, "CRM_ASYNC_DB_THREADS", 8)
+
+db_executor = ThreadPoolExecutor(max_workers=ASYNC_DB_THREADS, thread_name_prefix="crm-db")
+
+
+def run_in_db_thread(fn, trace=None):
+    """
+    Wrap the synchronous ``fn`` so awaiting it runs it on the bounded DB
+    pool, with connections recycled like at the end of a request and the
+    request's SQL tracing (if any) installed on the worker's connection.
+    """
+
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            with connection.execute_wrapper(trace) if trace else nullcontext():
+                return fn(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False, executor=db_executor)
+
+
+class ThreadedRootExecutionContext(ExecutionContext):
+    """
+    Resolve each top-level field of a query, with its whole subtree, on the
+    DB pool. The root fields become awaitables, which graphql-core gathers,
+    so independent siblings (``customers`` and ``crmStats``, ...) run
+    concurrently while the resolvers below them stay synchronous ORM code.
+    Mutation fields keep running serially in the calling thread.
+    """
+
+    def execute_field(self, parent_type, source, field_nodes, path):
+        if path.prev is not None or self.operation.operation != OperationType.QUERY:
+            return super().execute_field(parent_type, source, field_nodes, path)
+
+        trace = getattr(self.context_value, "trace", None)
+        return run_in_db_thread(super().execute_field, trace)(parent_type, source, field_nodes, path)
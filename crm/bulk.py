@@ -0,0 +1,40 @@
+from django.conf import settings
+
+from .models import Customer
+
+BULK_BATCH_SIZE = getattr(settings, "CRM_BULK_BATCH_SIZE", 500)
+
+DUPLICATE_EMAIL = "duplicate_email"
+INVALID_PHONE = "invalid_phone"
+
+
+def bulk_create_customers(rows, phone_re, batch_size=BULK_BATCH_SIZE):
+    """
+    Validate and insert customers as a set instead of row by row.
+
+    ``rows`` are dicts with ``name``, ``email`` and ``phone``. Emails are
+    checked against the batch and the database with one ``email__in``
+    query, phones with the precompiled ``phone_re``, and the remaining rows
+    are inserted with chunked ``bulk_create``.
+
+    Returns ``(created, rejected)`` where ``rejected`` is a list of
+    ``(row, reason)`` in input order.
+    """
+    emails = {row["email"] for row in rows}
+    taken = set(Customer.objects.filter(email__in=emails).values_list("email", flat=True))
+
+    accepted = []
+    rejected = []
+    for row in rows:
+        if row["email"] in taken:
+            rejected.append((row, DUPLICATE_EMAIL))
+            continue
+        if row["phone"] and not phone_re.match(row["phone"]):
+            rejected.append((row, INVALID_PHONE))
+            continue
+
+        taken.add(row["email"])
+        accepted.append(Customer(name=row["name"], email=row["email"], phone=row["phone"]))
+
+    created = Customer.objects.bulk_create(accepted, batch_size=batch_size)
+    return created, rejected
@@ -0,0 +1,115 @@
+"""
+Cross-request cache for product lookups, kept in a Django cache backend
+(``CRM_PRODUCT_CACHE_ALIAS``; locmem unless CACHES says otherwise).
+
+Every key embeds the catalogue version, and any product write bumps the
+version instead of deleting keys, so invalidation is one cache operation
+and stale entries simply expire.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Product
+
+CACHE_ALIAS = getattr(settings, "CRM_PRODUCT_CACHE_ALIAS", "default")
+CACHE_TIMEOUT = getattr(settings, "CRM_PRODUCT_CACHE_TIMEOUT", 300)
+VERSION_KEY = "crm:products:version"
+
+
+# --------------------------
+# Metrics
+# --------------------------
+class CatalogueStats:
+    """Per-process hit/miss counters for the shared product cache."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+
+    def clear(self):
+        self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": CACHE_ALIAS,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+catalogue_stats = CatalogueStats()
+
+
+# --------------------------
+# Versioned keys
+# --------------------------
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def catalogue_version():
+    # Seeded from the clock so a lost version key never revives old entries
+    return get_cache().get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+
+
+def invalidate_catalogue():
+    """Bump the version so every cached product entry is ignored from now on."""
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _key(version, *parts):
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f"crm:products:{version}:{digest}"
+
+
+# --------------------------
+# Cached lookups
+# --------------------------
+def cached_products(name, params, load):
+    """
+    Return ``list(load())`` for a product query identified by ``name`` and
+    ``params``, shared across requests until the catalogue changes.
+    """
+    cache = get_cache()
+    key = _key(catalogue_version(), name, sorted(params.items()))
+    products = cache.get(key)
+    if products is not None:
+        catalogue_stats.record(1, 0)
+        return products
+
+    catalogue_stats.record(0, 1)
+    products = list(load())
+    cache.set(key, products, CACHE_TIMEOUT)
+    return products
+
+
+def get_products(ids):
+    """Products for ``ids`` (missing ones are skipped), one cache entry per product."""
+    cache = get_cache()
+    version = catalogue_version()
+    keys = {int(pk): _key(version, "product", int(pk)) for pk in ids}
+
+    found = cache.get_many(keys.values())
+    products = {pk: found[key] for pk, key in keys.items() if key in found}
+    missing = [pk for pk in keys if pk not in products]
+    catalogue_stats.record(len(products), len(missing))
+
+    if missing:
+        loaded = Product.objects.in_bulk(missing)
+        cache.set_many({keys[pk]: product for pk, product in loaded.items()}, CACHE_TIMEOUT)
+        products.update(loaded)
+
+    return [products[pk] for pk in keys if pk in products]
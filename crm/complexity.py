@@ -0,0 +1,151 @@
+from django.conf import settings
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    GraphQLError,
+    InlineFragmentNode,
+    IntValueNode,
+    OperationDefinitionNode,
+    ValidationRule,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_list_type,
+)
+
+from .filters import LIST_LIMIT
+from .pagination import MAX_PAGE_SIZE
+
+# Budgets per operation; None disables the check
+MAX_QUERY_DEPTH = getattr(settings, "CRM_MAX_QUERY_DEPTH", 10)
+MAX_QUERY_COST = getattr(settings, "CRM_MAX_QUERY_COST", 10000)
+
+# Assumed length of a related list without ``first`` (an order's products);
+# root lists are counted at the LIST_LIMIT their resolvers cap them to
+LIST_SIZE = getattr(settings, "CRM_QUERY_LIST_SIZE", 50)
+
+# "Type.field" -> cost of resolving the field once. Object fields default
+# to 1 and scalars to 0, so the cost estimates the objects materialised.
+FIELD_WEIGHTS = getattr(settings, "CRM_QUERY_FIELD_WEIGHTS", {
+    "Query.crmStats": 10,
+    "CustomerConnection.totalCount": 5,
+    "ProductConnection.totalCount": 5,
+    "OrderConnection.totalCount": 5,
+})
+
+
+# --------------------------
+# Estimation
+# --------------------------
+def _multiplier(schema, parent_type, field, node):
+    """How many times the field's selection set is resolved."""
+    if "first" in field.args:
+        # Unknown (variable or omitted) page sizes count as the largest page
+        first = next((a.value for a in node.arguments if a.name.value == "first"), None)
+        if isinstance(first, IntValueNode):
+            return max(0, min(int(first.value), MAX_PAGE_SIZE))
+        return MAX_PAGE_SIZE
+    # A connection's edges are already counted by the connection's ``first``
+    if is_list_type(get_nullable_type(field.type)) and "pageInfo" not in parent_type.fields:
+        if parent_type is schema.query_type and LIST_LIMIT is not None:
+            return LIST_LIMIT
+        return LIST_SIZE
+    return 1
+
+
+def _field_cost(schema, parent_type, node, fragments, spread):
+    name = node.name.value
+    field = getattr(parent_type, "fields", {}).get(name)
+    # Introspection is free, unknown fields are reported by the standard rules
+    if name.startswith("__") or field is None:
+        return 0, 0
+
+    cost, depth = 0, 0
+    if node.selection_set:
+        cost, depth = _selection_cost(
+            schema, get_named_type(field.type), node.selection_set, fragments, spread
+        )
+    weight = FIELD_WEIGHTS.get(f"{parent_type.name}.{name}", 1 if node.selection_set else 0)
+    return _multiplier(schema, parent_type, field, node) * (weight + cost), depth + 1
+
+
+def _selection_cost(schema, parent_type, selection_set, fragments, spread=frozenset()):
+    cost, depth = 0, 0
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            field_cost, field_depth = _field_cost(schema, parent_type, selection, fragments, spread)
+        else:
+            inner = spread
+            if isinstance(selection, InlineFragmentNode):
+                condition, selections = selection.type_condition, selection.selection_set
+            else:
+                name = selection.name.value
+                fragment = fragments.get(name)
+                if fragment is None or name in spread:
+                    continue
+                inner = spread | {name}
+                condition, selections = fragment.type_condition, fragment.selection_set
+            type_ = schema.get_type(condition.name.value) if condition else parent_type
+            if type_ is None:
+                continue
+            field_cost, field_depth = _selection_cost(schema, type_, selections, fragments, inner)
+        cost += field_cost
+        depth = max(depth, field_depth)
+    return cost, depth
+
+
+def operation_cost(schema, document, operation=None):
+    """
+    Return ``{"cost", "depth"}`` for one operation of ``document``:
+    ``operation`` is its node or name (None for the only operation).
+
+    Only literals are read, so the estimate does not depend on variables
+    and holds for every execution of a cached document.
+    """
+    if not hasattr(operation, "operation"):
+        operation = get_operation_ast(document, operation)
+    if operation is None:
+        return {"cost": 0, "depth": 0}
+
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    }
+    root_type = schema.get_root_type(operation.operation)
+    cost, depth = _selection_cost(schema, root_type, operation.selection_set, fragments)
+    return {"cost": cost, "depth": depth}
+
+
+def document_costs(schema, document):
+    """``operation_cost`` of every operation in ``document``, keyed by name (None if anonymous)."""
+    return {
+        definition.name.value if definition.name else None: operation_cost(schema, document, definition)
+        for definition in document.definitions
+        if isinstance(definition, OperationDefinitionNode)
+    }
+
+
+# --------------------------
+# Validation rule
+# --------------------------
+class QueryCostRule(ValidationRule):
+    """Reject operations above MAX_QUERY_DEPTH or MAX_QUERY_COST before execution."""
+
+    def enter_operation_definition(self, node, *args):
+        if self.context.schema.get_root_type(node.operation) is None:
+            return
+        estimate = operation_cost(self.context.schema, self.context.document, node)
+
+        if MAX_QUERY_DEPTH is not None and estimate["depth"] > MAX_QUERY_DEPTH:
+            self.report_error(GraphQLError(
+                f"Query depth {estimate['depth']} exceeds the limit of {MAX_QUERY_DEPTH}.",
+                node,
+                extensions={"code": "QUERY_TOO_DEEP", **estimate},
+            ))
+        if MAX_QUERY_COST is not None and estimate["cost"] > MAX_QUERY_COST:
+            self.report_error(GraphQLError(
+                f"Query cost {estimate['cost']} exceeds the limit of {MAX_QUERY_COST}.",
+                node,
+                extensions={"code": "QUERY_TOO_COMPLEX", **estimate},
+            ))
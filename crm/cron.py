@@ -1,38 +1,35 @@
 from datetime import datetime
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+from gql import gql
+
+from crm.graphql_client import execute
 
 LOW_STOCK_LOG = "/tmp/low_stock_updates_log.txt"
 HEARTBEAT_LOG = "/tmp/crm_heartbeat_log.txt"
 
+LOW_STOCK_MUTATION = gql(
+    """
+    mutation ($incremental: Boolean!) {
+        updateLowStockProducts(incremental: $incremental) {
+            success
+            products {
+                name
+                stock
+            }
+        }
+    }
+    """
+)
+
 
-def update_low_stock():
-    """Run GraphQL mutation to restock low-stock products and log results."""
+def update_low_stock(full=False):
+    """
+    Run GraphQL mutation to restock low-stock products and log results.
+    Only products changed since the previous run are checked unless ``full``.
+    """
     timestamp = datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
 
     try:
-        transport = RequestsHTTPTransport(
-            url="http://localhost:8000/graphql",
-            verify=False,
-            retries=3,
-        )
-        client = Client(transport=transport, fetch_schema_from_transport=True)
-
-        mutation = gql(
-            """
-            mutation {
-                updateLowStockProducts {
-                    success
-                    products {
-                        name
-                        stock
-                    }
-                }
-            }
-            """
-        )
-
-        result = client.execute(mutation)
+        result = execute(LOW_STOCK_MUTATION, {"incremental": not full})
         updates = result["updateLowStockProducts"]["products"]
 
         with open(LOW_STOCK_LOG, "a") as f:
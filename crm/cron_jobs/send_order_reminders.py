@@ -1,54 +1,163 @@
 #!/usr/bin/env python3
+import os
 import sys
 import asyncio
-from datetime import datetime, timedelta
-from gql import gql, Client
-from gql.transport.requests import RequestsHTTPTransport
+from datetime import datetime, timedelta, timezone
+from gql import gql
 
-LOG_FILE = "/tmp/order_reminders_log.txt"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-async def main():
-    # إعداد الاتصال مع GraphQL endpoint
-    transport = RequestsHTTPTransport(
-        url="http://localhost:8000/graphql",
-        verify=False,
-        retries=3,
-    )
-    client = Client(transport=transport, fetch_schema_from_transport=True)
+from crm.graphql_client import JOB_TOKEN, make_async_client
 
-    # حساب التاريخ من 7 أيام
-    seven_days_ago = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-
-    # الاستعلام
-    query = gql(
-        """
-        query GetRecentOrders($since: Date!) {
-            orders(orderDate_Gte: $since) {
-                id
-                customer {
-                    email
+LOG_FILE = "/tmp/order_reminders_log.txt"
+PAGE_SIZE = 100
+CONCURRENCY = int(os.environ.get("CRM_REMINDER_CONCURRENCY", 20))
+JOB = "order_reminders"
+# Orders newer than this are left to the next run, so ones still being
+# committed during this run are not skipped (the server's CRM_JOB_WATERMARK_LAG)
+WATERMARK_LAG = timedelta(seconds=int(os.environ.get("CRM_JOB_WATERMARK_LAG", 60)))
+
+# الطلبات من تاريخ معيّن، صفحة بصفحة
+RECENT_ORDERS = gql(
+    """
+    query GetRecentOrders($since: DateTime!, $until: DateTime, $first: Int!, $after: String) {
+        allOrders(orderDate_Gte: $since, orderDate_Lte: $until, first: $first, after: $after) {
+            edges {
+                node {
+                    id
+                    customer {
+                        email
+                    }
                 }
             }
+            pageInfo {
+                hasNextPage
+                endCursor
+            }
         }
-        """
-    )
+    }
+    """
+)
 
-    # تنفيذ الاستعلام
-    result = await client.execute_async(query, variable_values={"since": seven_days_ago})
-    orders = result.get("orders", [])
+JOB_STATE = gql(
+    """
+    query GetJobState($job: String!) {
+        jobState(job: $job) {
+            lastTimestamp
+        }
+    }
+    """
+)
 
-    # تسجيل النتائج في اللوج
-    with open(LOG_FILE, "a") as f:
-        for order in orders:
-            order_id = order["id"]
+RECORD_RUN = gql(
+    """
+    mutation RecordJobRun($job: String!, $lastTimestamp: DateTime!) {
+        recordJobRun(job: $job, lastTimestamp: $lastTimestamp) {
+            jobState {
+                lastTimestamp
+            }
+        }
+    }
+    """
+)
+
+
+async def fetch_orders(session, since, queue, page_size=PAGE_SIZE, until=None):
+    """Page through the orders placed since ``since`` (up to ``until``) and queue them."""
+    after = None
+    while True:
+        result = await session.execute(
+            RECENT_ORDERS,
+            variable_values={"since": since, "until": until, "first": page_size, "after": after},
+        )
+        page = result["allOrders"]
+        for edge in page["edges"]:
+            await queue.put(edge["node"])
+
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        after = page["pageInfo"]["endCursor"]
+
+
+async def worker(queue, seen, remind):
+    while True:
+        order = await queue.get()
+        try:
             email = order["customer"]["email"]
-            f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S} - Order {order_id}, Email: {email}\n")
+            # تذكير واحد لكل عميل
+            if email not in seen:
+                seen.add(email)
+                await remind(order["id"], email)
+        except Exception as e:
+            print(f"Error reminding order {order['id']}: {e}", file=sys.stderr)
+        finally:
+            queue.task_done()
+
+
+async def send_reminders(session, since, remind, concurrency=CONCURRENCY, page_size=PAGE_SIZE, until=None):
+    """
+    Fetch recent orders page by page while up to ``concurrency`` workers
+    run ``remind(order_id, email)`` once per customer email.
+    Returns the number of customers reminded.
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    seen = set()
+    workers = [asyncio.create_task(worker(queue, seen, remind)) for _ in range(concurrency)]
+    try:
+        await fetch_orders(session, since, queue, page_size, until)
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    return len(seen)
+
+
+async def reminder_window(session, full=False):
+    """
+    ``(since, until)`` of this run: orders after the previous run's
+    watermark, within the last 7 days. ``full`` takes all 7 days.
+    """
+    now = datetime.now(timezone.utc)
+    # حساب التاريخ من 7 أيام
+    since = now - timedelta(days=7)
+    if not full:
+        state = (await session.execute(JOB_STATE, variable_values={"job": JOB}))["jobState"]
+        if state and state["lastTimestamp"]:
+            # The watermark order itself was included last time
+            since = max(since, datetime.fromisoformat(state["lastTimestamp"]) + timedelta(microseconds=1))
+    return since, now - WATERMARK_LAG
+
+
+async def main(full=False):
+    # jobState/recordJobRun are job-control operations: the server only
+    # runs them for staff or the shared token
+    if not JOB_TOKEN:
+        raise SystemExit(
+            "CRM_JOB_TOKEN is not set: export the token configured on the server "
+            "(its CRM_JOB_TOKEN setting) so the job can read and record its watermark."
+        )
+
+    timestamp = f"{datetime.now():%Y-%m-%d %H:%M:%S}"
+    lines = []
+
+    async def log_reminder(order_id, email):
+        lines.append(f"{timestamp} - Order {order_id}, Email: {email}\n")
+
+    async with make_async_client() as session:
+        since, until = await reminder_window(session, full)
+        await send_reminders(session, since.isoformat(), log_reminder, until=until.isoformat())
+        await session.execute(RECORD_RUN, variable_values={"job": JOB, "lastTimestamp": until.isoformat()})
+
+    # تسجيل النتائج في اللوج مرة واحدة
+    with open(LOG_FILE, "a") as f:
+        f.writelines(lines)
 
     print("Order reminders processed!")
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(full="--full" in sys.argv[1:]))
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
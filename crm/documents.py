@@ -0,0 +1,137 @@
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from graphql import GraphQLError, parse
+from graphql.validation import validate
+
+from .complexity import document_costs
+
+DOCUMENT_CACHE_SIZE = getattr(settings, "CRM_DOCUMENT_CACHE_SIZE", 256)
+
+
+# --------------------------
+# Parsed document cache
+# --------------------------
+class DocumentCache:
+    """
+    LRU of parsed and validated documents keyed by the query's sha256,
+    each stored with the cost estimate of its operations.
+
+    Only documents that passed validation are stored, so a hit can go
+    straight to execution. The same keys serve automatic persisted
+    queries, where the client sends the hash instead of the text.
+    """
+
+    def __init__(self, maxsize=DOCUMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._documents = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._documents.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._documents.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._documents[key] = entry
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._documents),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+document_cache = DocumentCache()
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+def _persisted_hash(extensions):
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise GraphQLError("Extensions must be a JSON object.")
+    if extensions is None:
+        return None
+    if not isinstance(extensions, dict):
+        raise GraphQLError("Invalid persistedQuery extension.")
+    persisted = extensions.get("persistedQuery")
+    if persisted is None:
+        return None
+    # The hash is part of the cache key, so it must be a string too
+    if not isinstance(persisted, dict) or not isinstance(persisted.get("sha256Hash"), (str, type(None))):
+        raise GraphQLError("Invalid persistedQuery extension.")
+    return persisted.get("sha256Hash")
+
+
+# --------------------------
+# Document lookup
+# --------------------------
+def get_document(schema, query, extensions=None, validation_rules=None, max_errors=None, cache=document_cache):
+    """
+    Return ``(document, costs, errors)`` for ``query``, parsing, validating
+    and estimating it (see ``document_costs``) only on a cache miss.
+
+    With an Apollo-style ``persistedQuery`` extension the query text may be
+    omitted; an unknown hash yields ``PersistedQueryNotFound`` so the client
+    retries with the full text, which is then registered under that hash.
+    """
+    try:
+        sha256 = _persisted_hash(extensions)
+    except GraphQLError as e:
+        return None, None, [e]
+    if not query and not sha256:
+        return None, None, [GraphQLError("Must provide query string.")]
+    if query and sha256 and query_hash(query) != sha256:
+        return None, None, [GraphQLError("provided sha does not match query")]
+
+    # Documents are only valid for the schema they were validated against
+    key = (id(schema), sha256 or query_hash(query))
+    entry = cache.get(key)
+    if entry is not None:
+        return (*entry, [])
+
+    if not query:
+        return None, None, [
+            GraphQLError("PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"})
+        ]
+
+    try:
+        document = parse(query)
+    except GraphQLError as e:
+        return None, None, [e]
+
+    errors = validate(schema, document, validation_rules, max_errors)
+    if errors:
+        return None, None, errors
+
+    costs = document_costs(schema, document)
+    cache.put(key, (document, costs))
+    return document, costs, []
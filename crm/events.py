@@ -0,0 +1,89 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+ORDER_CREATED = "order_created"
+STOCK_BELOW_THRESHOLD = "stock_below_threshold"
+
+# Stock level under which product changes are published; subscribers can
+# only ask for thresholds up to this one
+LOW_STOCK_THRESHOLD = getattr(settings, "CRM_LOW_STOCK_THRESHOLD", 10)
+
+
+# --------------------------
+# Brokers
+# --------------------------
+class InMemoryBroker:
+    """
+    Process-local broker: every subscriber gets its own bounded queue, fed
+    from whichever thread publishes. A subscriber that falls ``max_queued``
+    messages behind loses the oldest ones. Used in tests and single-process
+    deployments; a shared broker needs the same publish/subscribe methods.
+    """
+
+    def __init__(self, max_queued=1000):
+        self.max_queued = max_queued
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers[channel])
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, message)
+            except RuntimeError:
+                # The subscriber's event loop is gone
+                with self._lock:
+                    self._subscribers[channel].discard((loop, queue))
+
+    def _put(self, queue, message):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    async def subscribe(self, channel):
+        """Yield the messages published on ``channel`` from now on."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.max_queued))
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        try:
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+
+
+broker = import_string(getattr(settings, "CRM_EVENT_BROKER", "crm.events.InMemoryBroker"))()
+
+
+# --------------------------
+# Publishing
+# --------------------------
+def publish_on_commit(channel, message):
+    """Publish once the current transaction commits (immediately outside one)."""
+    transaction.on_commit(lambda: broker.publish(channel, message))
+
+
+def order_created(order):
+    publish_on_commit(ORDER_CREATED, {
+        "id": order.pk,
+        "customer_id": order.customer_id,
+        "total_amount": str(order.total_amount),
+        "order_date": order.order_date.isoformat(),
+    })
+
+
+def stock_below_threshold(products):
+    """``products``: rows with ``id``, ``name`` and ``stock`` below LOW_STOCK_THRESHOLD."""
+    for product in products:
+        publish_on_commit(STOCK_BELOW_THRESHOLD, {
+            "id": product["id"],
+            "name": product["name"],
+            "stock": product["stock"],
+        })
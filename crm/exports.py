@@ -0,0 +1,96 @@
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from graphene.utils.str_converters import to_camel_case
+from graphql import GraphQLError, Undefined
+
+from .filters import CUSTOMER_FILTERS, ORDER_FILTERS, apply_filters
+from .models import Customer, Order
+
+# Rows fetched per round trip (and per server-side cursor FETCH on PostgreSQL)
+EXPORT_CHUNK_SIZE = getattr(settings, "CRM_EXPORT_CHUNK_SIZE", 2000)
+
+# resource -> (model, filter spec, exported columns)
+EXPORTS = {
+    "customers": (Customer, CUSTOMER_FILTERS, ("id", "name", "email", "phone")),
+    "orders": (
+        Order,
+        ORDER_FILTERS,
+        ("id", "customer_id", "customer__email", "order_date", "total_amount"),
+    ),
+}
+
+FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+# --------------------------
+# Filters
+# --------------------------
+def parse_filters(spec, params):
+    """
+    Read the filters of ``spec`` from query parameters named like the
+    GraphQL arguments (``orderDate_Gte``, ``customerId``, ...).
+    """
+    args = {}
+    for lookup, type_ in spec.items():
+        name = to_camel_case(lookup)
+        raw = params.get(name)
+        if raw is None:
+            continue
+        value = type_.parse_value(raw)
+        if value is None or value is Undefined:
+            raise GraphQLError(f"Invalid value for {name}.")
+        args[lookup] = value
+    return args
+
+
+def export_queryset(resource, params):
+    """Return ``(header, rows)``; rows are streamed from the database in chunks."""
+    model, spec, columns = EXPORTS[resource]
+    queryset = apply_filters(model.objects.all(), spec, parse_filters(spec, params))
+    rows = queryset.order_by("pk").values_list(*columns).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return [column.replace("__", "_") for column in columns], rows
+
+
+# --------------------------
+# Serialisation
+# --------------------------
+class _Echo:
+    """File-like object handing back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(header, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(header, row))) + "\n"
+
+
+def chunked(lines, size=EXPORT_CHUNK_SIZE):
+    """Join ``size`` lines per yielded string so the response is not one write per row."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def export_lines(fmt, header, rows):
+    lines = csv_lines(header, rows) if fmt == "csv" else ndjson_lines(header, rows)
+    return chunked(lines)
@@ -0,0 +1,75 @@
+import graphene
+from django.conf import settings
+from graphql import GraphQLError
+
+# Rows a non-paginated list field may return, filtered or not (None: no limit)
+LIST_LIMIT = getattr(settings, "CRM_LIST_LIMIT", 1000)
+
+
+# --------------------------
+# Filter declarations
+# --------------------------
+# ORM lookup -> GraphQL argument type. Graphene camel-cases the lookups
+# (order_date__gte -> orderDate_Gte), matching the django-filter style.
+CUSTOMER_FILTERS = {
+    "name__startswith": graphene.String,
+    "email": graphene.String,
+}
+
+PRODUCT_FILTERS = {
+    "name__startswith": graphene.String,
+    "price__gte": graphene.Decimal,
+    "price__lte": graphene.Decimal,
+    "stock__gte": graphene.Int,
+    "stock__lt": graphene.Int,
+}
+
+ORDER_FILTERS = {
+    "order_date__gte": graphene.DateTime,
+    "order_date__lte": graphene.DateTime,
+    "customer_id": graphene.ID,
+    "total_amount__gte": graphene.Decimal,
+    "total_amount__lte": graphene.Decimal,
+}
+
+
+def filter_args(spec):
+    return {lookup: type_() for lookup, type_ in spec.items()}
+
+
+# --------------------------
+# Validation and application
+# --------------------------
+def _check_range(filters, field, low, high):
+    lower = filters.get(f"{field}__{low}")
+    upper = filters.get(f"{field}__{high}")
+    if lower is not None and upper is not None and lower > upper:
+        raise GraphQLError(f"Empty range for {field}: lower bound is above upper bound.")
+
+
+def apply_filters(queryset, spec, args):
+    """Return ``queryset`` with the declared lookups in ``args`` applied."""
+    filters = {lookup: args[lookup] for lookup in spec if args.get(lookup) is not None}
+
+    for field in ("order_date", "total_amount", "price"):
+        _check_range(filters, field, "gte", "lte")
+    _check_range(filters, "stock", "gte", "lt")
+
+    if "customer_id" in filters:
+        try:
+            filters["customer_id"] = int(filters["customer_id"])
+        except ValueError:
+            raise GraphQLError("Invalid customer ID.")
+
+    return queryset.filter(**filters)
+
+
+def limit_list(queryset):
+    """
+    Cap a non-paginated list field at LIST_LIMIT rows. Filters do not lift
+    the cap: a filter matching every row (``stock_Gte: 0``) would scan the
+    whole table just the same.
+    """
+    if LIST_LIMIT is None:
+        return queryset
+    return queryset.order_by("pk")[:LIST_LIMIT]
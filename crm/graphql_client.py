@@ -0,0 +1,103 @@
+"""
+Shared GraphQL client for the cron jobs and Celery tasks.
+
+With ``CRM_GRAPHQL_TRANSPORT = "local"`` in the Django settings documents
+run directly against the in-process graphene schema. Otherwise (including
+scripts running without Django settings) they go over HTTP to
+``CRM_GRAPHQL_URL``, validated against ``crm/schema.graphql`` instead of
+introspecting the server on every run, sending ``CRM_JOB_TOKEN`` (if set)
+as a bearer token for the job-control operations.
+
+Either way one connected session, with its keep-alive connection pool,
+is kept per worker process. Regenerate the SDL after changing the schema
+with::
+
+    python manage.py graphql_schema --schema alx_backend_graphql_crm.schema.schema --out crm/schema.graphql
+"""
+import os
+from pathlib import Path
+from threading import Lock
+from types import SimpleNamespace
+
+from gql import Client
+from gql.transport import Transport
+from gql.transport.requests import RequestsHTTPTransport
+from graphql import execute as execute_document
+
+GRAPHQL_URL = os.environ.get("CRM_GRAPHQL_URL", "http://localhost:8000/graphql")
+JOB_TOKEN = os.environ.get("CRM_JOB_TOKEN")
+SCHEMA_PATH = Path(__file__).resolve().parent / "schema.graphql"
+
+_session = None
+_lock = Lock()
+
+
+def load_schema():
+    return SCHEMA_PATH.read_text(encoding="utf-8")
+
+
+def auth_headers():
+    return {"Authorization": f"Bearer {JOB_TOKEN}"} if JOB_TOKEN else {}
+
+
+class SchemaTransport(Transport):
+    """
+    Execute documents against an in-process graphene schema, skipping HTTP.
+    Callers are the jobs themselves, so job-control operations are allowed.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+
+    def execute(self, request, *args, **kwargs):
+        return execute_document(
+            self.schema.graphql_schema,
+            request.document,
+            variable_values=request.variable_values,
+            operation_name=request.operation_name,
+            context_value=SimpleNamespace(job_access=True),
+        )
+
+
+def use_local_transport():
+    from django.conf import settings
+
+    return settings.configured and getattr(settings, "CRM_GRAPHQL_TRANSPORT", "http") == "local"
+
+
+def make_client():
+    if use_local_transport():
+        from alx_backend_graphql_crm.schema import schema
+
+        return Client(transport=SchemaTransport(schema), schema=schema.graphql_schema)
+
+    transport = RequestsHTTPTransport(url=GRAPHQL_URL, headers=auth_headers(), retries=3)
+    return Client(transport=transport, schema=load_schema())
+
+
+def make_async_client():
+    """Client for asyncio callers; needs the optional aiohttp dependency."""
+    from gql.transport.aiohttp import AIOHTTPTransport
+
+    return Client(transport=AIOHTTPTransport(url=GRAPHQL_URL, headers=auth_headers()), schema=load_schema())
+
+
+def get_session():
+    """Return the process-wide connected session, creating it on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = make_client().connect_sync()
+    return _session
+
+
+def execute(document, variable_values=None):
+    return get_session().execute(document, variable_values=variable_values)
+
+
+def close():
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.client.close_sync()
+            _session = None
@@ -0,0 +1,100 @@
+import threading
+from collections import defaultdict
+
+from .catalogue import get_products
+from .models import Customer, Order
+
+
+# --------------------------
+# Batching loader
+# --------------------------
+class DataLoader:
+    """
+    Synchronous per-request loader.
+
+    Keys are queued with ``prime()`` (usually by the list resolver that
+    knows every parent row) and fetched with a single ``IN (...)`` query
+    the first time any of them is loaded. Results are cached for the
+    lifetime of the loader, i.e. one GraphQL request. A lock keeps the
+    queue consistent when the async view resolves root fields in parallel.
+    """
+
+    def __init__(self, batch_load_fn, default=None):
+        self.batch_load_fn = batch_load_fn
+        self.default = default
+        self._cache = {}
+        self._queue = set()
+        self._lock = threading.RLock()
+
+    def prime(self, keys):
+        with self._lock:
+            self._queue.update(key for key in keys if key not in self._cache)
+
+    def load(self, key):
+        with self._lock:
+            if key not in self._cache:
+                self._queue.add(key)
+                self._dispatch()
+            return self._cache[key]
+
+    def load_many(self, keys):
+        keys = list(keys)
+        with self._lock:
+            self.prime(keys)
+            if self._queue:
+                self._dispatch()
+            return [self._cache[key] for key in keys]
+
+    def _dispatch(self):
+        keys = list(self._queue)
+        self._queue.clear()
+        results = self.batch_load_fn(keys)
+        for key in keys:
+            value = results.get(key)
+            if value is None and callable(self.default):
+                value = self.default()
+            self._cache[key] = value
+
+
+# --------------------------
+# Request-scoped loaders
+# --------------------------
+class Loaders:
+    """The loaders shared by every resolver of a single request."""
+
+    def __init__(self):
+        self.customer = DataLoader(self._load_customers)
+        self.product = DataLoader(self._load_products)
+        self.order_product_ids = DataLoader(self._load_order_product_ids, default=list)
+
+    def products_for_order(self, order_id):
+        product_ids = self.order_product_ids.load(order_id)
+        return [p for p in self.product.load_many(product_ids) if p is not None]
+
+    def _load_customers(self, ids):
+        return Customer.objects.in_bulk(ids)
+
+    def _load_products(self, ids):
+        return {product.pk: product for product in get_products(ids)}
+
+    def _load_order_product_ids(self, order_ids):
+        product_ids = defaultdict(list)
+        rows = Order.products.through.objects.filter(order_id__in=order_ids).values_list(
+            "order_id", "product_id"
+        )
+        for order_id, product_id in rows:
+            product_ids[order_id].append(product_id)
+
+        # Queue every product of this batch so the next level is one query too
+        self.product.prime(pid for pids in product_ids.values() for pid in pids)
+        return product_ids
+
+
+def get_loaders(context):
+    """Return the loaders attached to the GraphQL context, creating them once."""
+    loaders = getattr(context, "loaders", None)
+    if loaders is None:
+        loaders = Loaders()
+        if context is not None:
+            context.loaders = loaders
+    return loaders
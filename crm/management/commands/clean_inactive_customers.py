@@ -0,0 +1,55 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from crm.jobs import inactive_customers, report_changed
+from crm.models import Customer, Order
+from crm.sales import order_days, rebuild_daily_sales, rebuilt_by_caller
+
+
+class Command(BaseCommand):
+    help = "Delete customers with no orders in the last --days days, in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count the customers that would be deleted."
+        )
+
+    def handle(self, *args, days, batch_size, dry_run, **options):
+        inactive = inactive_customers(timezone.now() - timedelta(days=days))
+
+        if dry_run:
+            self.stdout.write(f"Would delete {inactive.count()} inactive customers")
+            return
+
+        deleted = Counter()
+        order_dates = set()
+        last_pk = 0
+        while True:
+            ids = list(
+                inactive.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_pk = ids[-1]
+
+            # One short transaction per batch; re-check inactivity at delete time.
+            # The days are rebuilt once at the end instead of per deleted order.
+            with transaction.atomic(), rebuilt_by_caller():
+                order_dates |= order_days(Order.objects.filter(customer_id__in=ids))
+                _, per_table = inactive.filter(pk__in=ids).delete()
+            deleted.update(per_table)
+
+        customers = deleted[Customer._meta.label]
+        if customers:
+            report_changed()
+        if deleted[Order._meta.label]:
+            # Recompute the days the deleted orders were rolled up in
+            rebuild_daily_sales(min(order_dates), max(order_dates) + timedelta(days=1))
+        tables = ", ".join(f"{label}: {count}" for label, count in sorted(deleted.items()))
+        self.stdout.write(f"Deleted {customers} inactive customers ({tables or 'nothing to delete'})")
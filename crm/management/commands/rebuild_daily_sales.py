@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.sales import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the DailySales rollup from the orders with GROUP BY, for the local dates "
+        "in [--since, --until) or for all of history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", type=date.fromisoformat, help="First date (YYYY-MM-DD).")
+        parser.add_argument("--until", type=date.fromisoformat, help="Date after the last one (YYYY-MM-DD).")
+
+    def handle(self, *args, since, until, **options):
+        if (since is None) != (until is None):
+            raise CommandError("Pass both --since and --until, or neither.")
+        days = rebuild_daily_sales(since, until)
+        self.stdout.write(f"Rebuilt daily sales for {days} days with orders")
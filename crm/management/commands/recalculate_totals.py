@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from crm.models import Order, order_lines_total
+from crm.sales import rebuild_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Order.total_amount from the order's line items, one SQL UPDATE per id range, "
+        "then rebuild the DailySales rollup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, batch_size, **options):
+        total = order_lines_total()
+        updated = 0
+        last_pk = 0
+
+        while True:
+            # The pk closing this batch; the last batch runs to the end of the table
+            upper = list(
+                Order.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[batch_size - 1:batch_size]
+            )
+            batch = Order.objects.filter(pk__gt=last_pk)
+            if upper:
+                batch = batch.filter(pk__lte=upper[0])
+
+            with transaction.atomic():
+                updated += batch.update(total_amount=total)
+
+            if not upper:
+                break
+            last_pk = upper[0]
+
+        if updated:
+            rebuild_daily_sales()
+        self.stdout.write(f"Recalculated totals for {updated} orders")
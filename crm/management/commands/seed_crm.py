@@ -0,0 +1,132 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from crm.models import Customer, Order, OrderItem, Product
+from crm.sales import rebuild_daily_sales
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights where the item of rank r is picked ~ 1 / r**exponent."""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic customers, products and orders with bulk inserts. "
+        "The same --seed always produces the same data set."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=10000)
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--orders", type=int, default=50000)
+        parser.add_argument(
+            "--items-per-order", type=float, default=3.0, help="Average distinct products per order."
+        )
+        parser.add_argument("--days", type=int, default=730, help="Spread order dates over the last N days.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, customers, products, orders, items_per_order, days, batch_size, seed, **options):
+        if orders and not (customers and products):
+            raise CommandError("Orders need at least one customer and one product.")
+        rng = random.Random(seed)
+        start = time.perf_counter()
+
+        customer_ids = self.create_customers(rng, customers, batch_size)
+        prices = self.create_products(rng, products, batch_size)
+        lines = self.create_orders(rng, orders, customer_ids, prices, items_per_order, days, batch_size)
+
+        self.stdout.write(
+            f"Seeded {len(customer_ids)} customers, {len(prices)} products, {orders} orders "
+            f"({lines} line items) in {time.perf_counter() - start:.1f}s"
+        )
+
+    def batches(self, count, batch_size):
+        for offset in range(0, count, batch_size):
+            yield range(offset, min(offset + batch_size, count))
+
+    def create_customers(self, rng, count, batch_size):
+        # Continue after existing rows so repeated runs never clash on email
+        first = (Customer.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        ids = []
+        for batch in self.batches(count, batch_size):
+            rows = [
+                Customer(
+                    name=f"Customer {first + i}",
+                    email=f"customer{first + i}@example.com",
+                    phone=f"+1555{rng.randrange(10 ** 7):07d}" if rng.random() < 0.8 else None,
+                )
+                for i in batch
+            ]
+            with transaction.atomic():
+                ids.extend(c.pk for c in Customer.objects.bulk_create(rows))
+        return ids
+
+    def create_products(self, rng, count, batch_size):
+        prices = {}
+        for batch in self.batches(count, batch_size):
+            rows = [
+                Product(
+                    name=f"Product {i}",
+                    price=Decimal(f"{max(rng.lognormvariate(3.5, 1.0), 0.5):.2f}"),
+                    stock=rng.randrange(200),
+                )
+                for i in batch
+            ]
+            with transaction.atomic():
+                prices.update((p.pk, p.price) for p in Product.objects.bulk_create(rows))
+        return prices
+
+    def create_orders(self, rng, count, customer_ids, prices, items_per_order, days, batch_size):
+        # A few customers and products account for most orders and lines
+        customer_weights = zipf_weights(len(customer_ids), 0.8)
+        product_ids = list(prices)
+        rng.shuffle(product_ids)
+        product_weights = zipf_weights(len(product_ids), 1.0)
+
+        now = timezone.now()
+        span = timedelta(days=days).total_seconds()
+        extra_lines = max(items_per_order - 1, 0)
+        lines = 0
+
+        for batch in self.batches(count, batch_size):
+            orders, items = [], []
+            for _ in batch:
+                picks = 1 + (round(rng.expovariate(1 / extra_lines)) if extra_lines else 0)
+                quantities = {
+                    pid: rng.choice((1, 1, 1, 2, 3))
+                    for pid in rng.choices(product_ids, cum_weights=product_weights, k=picks)
+                }
+                orders.append(Order(
+                    customer_id=rng.choices(customer_ids, cum_weights=customer_weights)[0],
+                    order_date=now - timedelta(seconds=rng.random() * span),
+                    total_amount=sum(prices[pid] * qty for pid, qty in quantities.items()),
+                ))
+                items.append(quantities)
+
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(
+                    [
+                        OrderItem(order_id=order.pk, product_id=pid, quantity=qty, unit_price=prices[pid])
+                        for order, quantities in zip(orders, items)
+                        for pid, qty in quantities.items()
+                    ],
+                    batch_size=batch_size,
+                )
+            lines += sum(len(quantities) for quantities in items)
+
+        if count:
+            # bulk_create skips the signals that maintain DailySales
+            first_day = timezone.localdate(now - timedelta(days=days))
+            rebuild_daily_sales(first_day, timezone.localdate(now) + timedelta(days=1))
+        return lines
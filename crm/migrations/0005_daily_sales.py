@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_sales(apps, schema_editor):
+    Order = apps.get_model("crm", "Order")
+    OrderItem = apps.get_model("crm", "OrderItem")
+    DailySales = apps.get_model("crm", "DailySales")
+    DailyProductSales = apps.get_model("crm", "DailyProductSales")
+
+    daily = (
+        Order.objects.annotate(day=TruncDate("order_date"))
+        .values("day")
+        .annotate(
+            order_count=models.Count("id"),
+            revenue=models.Sum("total_amount"),
+            customer_count=models.Count("customer", distinct=True),
+        )
+        .order_by()
+    )
+    DailySales.objects.bulk_create(
+        (
+            DailySales(
+                date=row["day"],
+                order_count=row["order_count"],
+                revenue=row["revenue"] or 0,
+                customer_count=row["customer_count"],
+            )
+            for row in daily.iterator()
+        ),
+        batch_size=1000,
+    )
+    units = (
+        OrderItem.objects.annotate(day=TruncDate("order__order_date"))
+        .values("day", "product")
+        .annotate(units=models.Sum("quantity"))
+        .order_by()
+    )
+    DailyProductSales.objects.bulk_create(
+        (
+            DailyProductSales(date=row["day"], product_id=row["product"], units=row["units"])
+            for row in units.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_job_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customer_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='crm.product')),
+            ],
+            options={
+                'unique_together': {('date', 'product')},
+            },
+        ),
+        migrations.RunPython(populate_daily_sales, migrations.RunPython.noop),
+    ]
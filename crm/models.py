@@ -1,3 +1,140 @@
 from django.db import models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.core.validators import MinValueValidator
+from django.utils import timezone
 
-# Create your models here.
+class Customer(models.Model):
+    name = models.CharField(max_length=255)
+    email = models.EmailField(unique=True)
+    phone = models.CharField(max_length=20, blank=True, null=True)
+
+    def __str__(self):
+        return self.name
+
+class Product(models.Model):
+    name = models.CharField(max_length=255)
+    price = models.DecimalField(max_digits=10, decimal_places=2,
+                                 validators=[MinValueValidator(0.01)])
+    stock = models.PositiveIntegerField(default=0)
+    # Set on save; queryset updates of stock set it explicitly
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Restock scans low-stock rows in id order; partial where supported
+            models.Index(fields=["id"], condition=Q(stock__lt=10), name="crm_product_low_stock_idx"),
+            # Incremental restock: products changed since the job's watermark
+            models.Index(fields=["updated_at"], name="crm_product_updated_idx"),
+        ]
+
+    def __str__(self):
+        return self.name
+
+class Order(models.Model):
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
+    products = models.ManyToManyField(Product, through="OrderItem")
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    order_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Reminders and allOrders pages: order_date range in (order_date, id) order
+            models.Index(fields=["order_date", "id"], name="crm_order_date_idx"),
+            # Inactive-customer cleanup: NOT EXISTS (customer = ? AND order_date >= ?)
+            models.Index(fields=["customer", "order_date"], name="crm_order_cust_date_idx"),
+        ]
+
+    def calculate_total(self):
+        total = self.items.aggregate(total=Sum(line_total()))["total"]
+        self.total_amount = total or 0
+        self.save(update_fields=["total_amount"])
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    # Price at the time of the order; filled from the product when not given
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        # Reuses the table of the former auto-created Order.products through model
+        db_table = "crm_order_products"
+        unique_together = ("order", "product")
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product}"
+
+class DailySales(models.Model):
+    """Orders rolled up per local date of ``order_date`` (see crm/sales.py)."""
+    date = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Distinct customers ordering that day; not additive across days
+    customer_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.date)
+
+
+class DailyProductSales(models.Model):
+    """Units of a product sold per local date of ``order_date``."""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales")
+    units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("date", "product")
+
+    def __str__(self):
+        return f"{self.date}: {self.units} x {self.product}"
+
+
+class JobState(models.Model):
+    """
+    Watermark of an incremental background job: the last row id and/or
+    timestamp it processed, and any running totals it keeps.
+    """
+    job = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    totals = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.job
+
+class ChunkResult(models.Model):
+    """
+    Result of one chunk of a Celery batch workflow, keyed by run and id
+    range, so a retried or redelivered chunk returns it instead of redoing
+    the work.
+    """
+    key = models.CharField(max_length=200, unique=True)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+def line_total(prefix=""):
+    """quantity * unit_price of an OrderItem, optionally through a relation prefix."""
+    return ExpressionWrapper(
+        F(f"{prefix}quantity") * F(f"{prefix}unit_price"),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+def order_lines_total(product_ids=None):
+    """
+    Correlated subquery summing the outer Order's lines, optionally only
+    those for ``product_ids``. Orders without such lines total 0.
+    """
+    lines = OrderItem.objects.filter(order=OuterRef("pk"))
+    if product_ids is not None:
+        lines = lines.filter(product_id__in=product_ids)
+    return Coalesce(
+        Subquery(lines.values("order").annotate(total=Sum(line_total())).values("total")),
+        Value(0),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
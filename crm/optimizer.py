@@ -0,0 +1,99 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+
+# --------------------------
+# Selection set walking
+# --------------------------
+def selected_fields(info):
+    """
+    Return the fields requested below the current field as a nested dict
+    keyed by snake_case name, with fragments and aliases merged.
+    """
+    tree = {}
+    for node in info.field_nodes:
+        if node.selection_set:
+            _collect(info, node.selection_set.selections, tree)
+    return tree
+
+
+def _collect(info, selections, tree):
+    for selection in selections:
+        if isinstance(selection, FieldNode):
+            name = selection.name.value
+            if name.startswith("__"):
+                continue
+            subtree = tree.setdefault(to_snake_case(name), {})
+            if selection.selection_set:
+                _collect(info, selection.selection_set.selections, subtree)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = info.fragments[selection.name.value]
+            _collect(info, fragment.selection_set.selections, tree)
+        elif isinstance(selection, InlineFragmentNode):
+            _collect(info, selection.selection_set.selections, tree)
+
+
+# --------------------------
+# Query planning
+# --------------------------
+class QueryPlan:
+    def __init__(self):
+        self.only = set()
+        self.select_related = set()
+        self.prefetch_related = []
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        return queryset.only(*sorted(self.only))
+
+
+def plan_query(model, tree, prefix="", plan=None):
+    """Map a selection tree onto only()/select_related()/prefetch_related()."""
+    plan = plan or QueryPlan()
+    plan.only.add(prefix + model._meta.pk.name)
+
+    for name, subtree in tree.items():
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Resolver-only field: nothing to load for it
+            continue
+
+        path = prefix + name
+        if field.many_to_many or field.one_to_many:
+            related = field.related_model
+            inner_plan = plan_query(related, subtree)
+            if field.one_to_many:
+                # The prefetch matches reverse FK rows to their parent by this column
+                inner_plan.only.add(field.field.attname)
+            inner = inner_plan.apply(related._default_manager.all())
+            plan.prefetch_related.append(Prefetch(path, queryset=inner))
+        elif field.is_relation:
+            plan.only.add(path)
+            plan.select_related.add(path)
+            plan_query(field.related_model, subtree, prefix=path + "__", plan=plan)
+        else:
+            plan.only.add(path)
+
+    return plan
+
+
+def optimize_queryset(queryset, info, path=(), fields=()):
+    """
+    Load only what the GraphQL selection below ``info`` asks for.
+
+    ``path`` descends into wrapper fields (e.g. ``("edges", "node")`` for
+    connections) and ``fields`` are columns that must always be loaded.
+    """
+    tree = selected_fields(info)
+    for name in path:
+        tree = tree.get(name, {})
+
+    plan = plan_query(queryset.model, tree)
+    plan.only.update(fields)
+    return plan.apply(queryset)
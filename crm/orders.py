@@ -0,0 +1,96 @@
+from django.db import transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+from graphql import GraphQLError
+
+from . import events, sales
+from .models import Order, OrderItem, Product
+from .signals import catalogue_changed
+
+
+def order_quantities(product_ids=None, items=None):
+    """
+    Merge ``product_ids`` (quantity 1 each, repeats add up) and ``items``
+    (``{"product_id", "quantity"}``) into ``{product_pk: quantity}``.
+    """
+    lines = [(product_id, 1) for product_id in product_ids or []]
+    lines += [(item["product_id"], item["quantity"]) for item in items or []]
+
+    quantities = {}
+    for product_id, quantity in lines:
+        if quantity < 1:
+            raise GraphQLError("Quantity must be at least 1.")
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            raise GraphQLError("One or more product IDs are invalid.")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def reserve_stock(quantities):
+    """
+    Take ``quantities`` out of stock with one conditional UPDATE.
+
+    Each product row is only matched while it still has enough stock, so
+    concurrent orders cannot oversell and no SELECT ... FOR UPDATE is
+    needed. Raises GraphQLError listing the short products otherwise, or
+    when some of the products do not exist.
+    """
+    enough = Q()
+    for product_id, quantity in quantities.items():
+        enough |= Q(pk=product_id, stock__gte=quantity)
+    new_stock = Case(
+        *(When(pk=product_id, then=F("stock") - quantity) for product_id, quantity in quantities.items())
+    )
+
+    with transaction.atomic():
+        reserved = Product.objects.filter(enough).update(stock=new_stock, updated_at=timezone.now())
+        if reserved != len(quantities):
+            # Undo the lines that did fit so the error reports real stock
+            transaction.set_rollback(True)
+
+    if reserved != len(quantities):
+        short = list(Product.objects.filter(pk__in=quantities).order_by("pk"))
+        if len(short) != len(quantities):
+            raise GraphQLError("One or more product IDs are invalid.")
+        details = ", ".join(
+            f"{p.name} (requested {quantities[p.pk]}, available {p.stock})"
+            for p in short
+            if p.stock < quantities[p.pk]
+        )
+        raise GraphQLError(f"Insufficient stock for: {details}.")
+
+    catalogue_changed.send(sender=Product)
+    events.stock_below_threshold(
+        Product.objects.filter(pk__in=quantities, stock__lt=events.LOW_STOCK_THRESHOLD).values(
+            "id", "name", "stock"
+        )
+    )
+
+
+@transaction.atomic
+def place_order(customer, quantities, order_date=None):
+    """
+    Reserve stock for every line and create the order with its line items
+    in one transaction. The line unit prices are read from the product
+    rows just reserved (locked by the UPDATE), never from the catalogue
+    cache, which other processes do not invalidate.
+    orderCreated/stockBelowThreshold events go out once it commits.
+    """
+    reserve_stock(quantities)
+
+    prices = dict(Product.objects.filter(pk__in=quantities).values_list("id", "price"))
+    order = Order.objects.create(
+        customer=customer,
+        total_amount=sum(prices[pk] * quantity for pk, quantity in quantities.items()),
+        order_date=order_date or timezone.now(),
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=pk, quantity=quantity, unit_price=prices[pk])
+        for pk, quantity in quantities.items()
+    ])
+    # The order itself was added to DailySales when it was saved
+    sales.record_units(sales.order_day(order), quantities)
+    events.order_created(order)
+    return order
@@ -0,0 +1,109 @@
+import base64
+import json
+from datetime import datetime
+
+import graphene
+from django.conf import settings
+from django.db.models import Q
+from graphql import GraphQLError
+
+from .optimizer import optimize_queryset
+
+MAX_PAGE_SIZE = getattr(settings, "CRM_MAX_PAGE_SIZE", 100)
+
+
+# --------------------------
+# Connection base type
+# --------------------------
+class CountableConnection(graphene.relay.Connection):
+    """Relay connection whose totalCount is only computed when selected."""
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(root, info):
+        return root.queryset.count()
+
+
+def connection_args():
+    return {"first": graphene.Int(), "after": graphene.String()}
+
+
+# --------------------------
+# Cursors
+# --------------------------
+def encode_cursor(obj, ordering):
+    values = []
+    for name in ordering:
+        value = getattr(obj, name)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, ordering, model):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(ordering):
+            raise ValueError(cursor)
+        return [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(ordering, values)
+        ]
+    except Exception:
+        raise GraphQLError("Invalid cursor.")
+
+
+def _after(ordering, values):
+    """Build the keyset predicate (a, b) > (x, y) as nested OR/AND lookups."""
+    condition = Q()
+    for i, name in enumerate(ordering):
+        step = Q(**{f"{name}__gt": values[i]})
+        for prev, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev: value})
+        condition |= step
+    return condition
+
+
+# --------------------------
+# Keyset pagination
+# --------------------------
+def keyset_connection(connection_type, queryset, info, ordering=("id",), first=None, after=None):
+    """
+    Return one page of ``queryset`` ordered by ``ordering``.
+
+    The page is located with a WHERE on the last seen sort key instead of
+    OFFSET, so every page costs the same no matter how deep it is.
+    """
+    if first is None:
+        first = MAX_PAGE_SIZE
+    if first < 0:
+        raise GraphQLError("first must be a non-negative integer.")
+    if first > MAX_PAGE_SIZE:
+        raise GraphQLError(f"Requesting {first} records exceeds the page size limit of {MAX_PAGE_SIZE}.")
+
+    page = queryset.order_by(*ordering)
+    if after is not None:
+        page = page.filter(_after(ordering, decode_cursor(after, ordering, queryset.model)))
+    page = optimize_queryset(page, info, path=("edges", "node"), fields=ordering)
+
+    rows = list(page[:first + 1])
+    has_next_page = len(rows) > first
+    rows = rows[:first]
+
+    edges = [
+        connection_type.Edge(node=row, cursor=encode_cursor(row, ordering))
+        for row in rows
+    ]
+    connection = connection_type(
+        edges=edges,
+        page_info=graphene.relay.PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=after is not None,
+            has_next_page=has_next_page,
+        ),
+    )
+    connection.queryset = queryset
+    return connection
@@ -0,0 +1,225 @@
+"""
+The DailySales / DailyProductSales rollup of orders per local date.
+
+New orders are added to their day with a few UPDATEs as they are created.
+Changes to orders already rolled up (line edits, recalculated totals,
+deletions) recompute the affected days, and whole date ranges are rebuilt
+with one GROUP BY per table. Reports read the rollup instead of scanning
+orders.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Min, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySales, Order, OrderItem
+
+# Days recomputed per transaction by rebuild_daily_sales
+REBUILD_DAYS = getattr(settings, "CRM_SALES_REBUILD_DAYS", 31)
+
+# Set while a bulk path that rebuilds its own days deletes orders
+_rebuilt_by_caller = ContextVar("crm_sales_rebuilt_by_caller", default=False)
+
+
+def day_start(day):
+    """Aware datetime of the local midnight opening ``day``."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def order_day(order):
+    return timezone.localdate(order.order_date)
+
+
+def order_days(orders):
+    """Distinct local dates of the ``orders`` queryset."""
+    return set(orders.annotate(day=TruncDate("order_date")).values_list("day", flat=True).distinct())
+
+
+def days_between(since=None, until=None):
+    """DailySales rows of the dates in [since, until)."""
+    days = DailySales.objects.all()
+    if since is not None:
+        days = days.filter(date__gte=since)
+    if until is not None:
+        days = days.filter(date__lt=until)
+    return days
+
+
+def totals(since=None, until=None):
+    """Order count and revenue of the dates in [since, until), summed over the rollup."""
+    return days_between(since, until).aggregate(
+        order_count=Coalesce(Sum("order_count"), 0),
+        revenue=Coalesce(Sum("revenue"), Value(Decimal("0.00")), output_field=DecimalField()),
+    )
+
+
+# --------------------------
+# Maintenance on order creation
+# --------------------------
+def _add(model, lookup, **deltas):
+    """``UPDATE ... SET f = f + delta`` on the row of ``lookup``, creating it when missing."""
+    increments = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created by a concurrent order in the meantime
+        model.objects.filter(**lookup).update(**increments)
+
+
+def record_order(order):
+    """Add a newly created order to its day."""
+    day = order_day(order)
+    repeat_customer = (
+        Order.objects.filter(
+            customer_id=order.customer_id,
+            order_date__gte=day_start(day),
+            order_date__lt=day_start(day + timedelta(days=1)),
+        )
+        .exclude(pk=order.pk)
+        .exists()
+    )
+    _add(
+        DailySales,
+        {"date": day},
+        order_count=1,
+        revenue=order.total_amount,
+        customer_count=0 if repeat_customer else 1,
+    )
+
+
+def record_units(day, quantities):
+    """Add the ``{product_id: quantity}`` lines of a new order to the product units of ``day``."""
+    rows = DailyProductSales.objects.filter(date=day, product_id__in=quantities)
+    existing = set(rows.values_list("product_id", flat=True))
+    if existing:
+        rows.update(
+            units=F("units") + Case(*(When(product_id=pk, then=quantities[pk]) for pk in existing))
+        )
+
+    missing = [pk for pk in quantities if pk not in existing]
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            DailyProductSales.objects.bulk_create(
+                DailyProductSales(date=day, product_id=pk, units=quantities[pk]) for pk in missing
+            )
+    except IntegrityError:
+        for pk in missing:
+            _add(DailyProductSales, {"date": day, "product_id": pk}, units=quantities[pk])
+
+
+# --------------------------
+# Rebuilds
+# --------------------------
+def _rebuild_window(start, end):
+    lower, upper = day_start(start), day_start(end)
+    orders = Order.objects.filter(order_date__gte=lower, order_date__lt=upper)
+    items = OrderItem.objects.filter(order__order_date__gte=lower, order__order_date__lt=upper)
+
+    with transaction.atomic():
+        daily = (
+            orders.annotate(day=TruncDate("order_date"))
+            .values("day")
+            .annotate(
+                order_count=Count("id"),
+                revenue=Sum("total_amount"),
+                customer_count=Count("customer", distinct=True),
+            )
+            .order_by()
+        )
+        units = (
+            items.annotate(day=TruncDate("order__order_date"))
+            .values("day", "product")
+            .annotate(units=Sum("quantity"))
+            .order_by()
+        )
+
+        DailySales.objects.filter(date__gte=start, date__lt=end).delete()
+        DailyProductSales.objects.filter(date__gte=start, date__lt=end).delete()
+        created = DailySales.objects.bulk_create(
+            DailySales(
+                date=row["day"],
+                order_count=row["order_count"],
+                revenue=row["revenue"] or 0,
+                customer_count=row["customer_count"],
+            )
+            for row in daily
+        )
+        DailyProductSales.objects.bulk_create(
+            (
+                DailyProductSales(date=row["day"], product_id=row["product"], units=row["units"])
+                for row in units
+            ),
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def rebuild_daily_sales(since=None, until=None):
+    """
+    Recompute the rollup of the local dates in [since, until) from the
+    orders; without bounds all of it, dropping days left without orders.
+    Runs one GROUP BY per table for every REBUILD_DAYS days, each window
+    in its own transaction. Returns the number of days with orders.
+    """
+    everything = since is None and until is None
+    if everything:
+        bounds = Order.objects.aggregate(first=Min("order_date"), last=Max("order_date"))
+        if bounds["first"] is None:
+            DailySales.objects.all().delete()
+            DailyProductSales.objects.all().delete()
+            return 0
+        since = timezone.localdate(bounds["first"])
+        until = timezone.localdate(bounds["last"]) + timedelta(days=1)
+        DailySales.objects.exclude(date__gte=since, date__lt=until).delete()
+        DailyProductSales.objects.exclude(date__gte=since, date__lt=until).delete()
+    elif since is None or until is None:
+        raise ValueError("Pass both since and until, or neither.")
+
+    days = 0
+    start = since
+    while start < until:
+        end = min(start + timedelta(days=REBUILD_DAYS), until)
+        days += _rebuild_window(start, end)
+        start = end
+    return days
+
+
+def refresh_days(days):
+    """Recompute the given dates, e.g. after orders on them changed."""
+    for day in sorted(set(days)):
+        rebuild_daily_sales(day, day + timedelta(days=1))
+
+
+@contextmanager
+def rebuilt_by_caller():
+    """
+    Orders deleted in the block do not refresh their day one by one: the
+    caller (a bulk cleanup) collects the days and rebuilds each once, and
+    resets the CRM report itself for the customers it deletes.
+    """
+    token = _rebuilt_by_caller.set(True)
+    try:
+        yield
+    finally:
+        _rebuilt_by_caller.reset(token)
+
+
+def caller_rebuilds():
+    return _rebuilt_by_caller.get()
+
+
+def refresh_deleted(order):
+    """Take a deleted order out of its day, unless the caller rebuilds it."""
+    if not caller_rebuilds():
+        refresh_days([order_day(order)])
@@ -1,11 +1,14 @@
 import re
 from decimal import Decimal
 from django.db import transaction
-from django.utils import timezone
 import graphene
 from graphene_django import DjangoObjectType
 from graphql import GraphQLError
+from .bulk import DUPLICATE_EMAIL, bulk_create_customers
 from .models import Customer, Product, Order
+from .orders import order_quantities, place_order
+
+PHONE_RE = re.compile(r'^(\+\d{10,15}|\d{3}-\d{3}-\d{4})$')
 
 
 # --------------------------
@@ -44,9 +47,15 @@ class ProductInput(graphene.InputObjectType):
     stock = graphene.Int(required=False)
 
 
+class OrderItemInput(graphene.InputObjectType):
+    product_id = graphene.ID(required=True)
+    quantity = graphene.Int(required=True)
+
+
 class OrderInput(graphene.InputObjectType):
     customer_id = graphene.ID(required=True)
-    product_ids = graphene.List(graphene.ID, required=True)
+    product_ids = graphene.List(graphene.ID, required=False)
+    items = graphene.List(OrderItemInput, required=False)
     order_date = graphene.DateTime(required=False)
 
 
@@ -69,7 +78,7 @@ class CreateCustomer(graphene.Mutation):
 
         # Optional phone format validation
         if input.phone:
-            if not re.match(r'^(\+\d{10,15}|\d{3}-\d{3}-\d{4})$', input.phone):
+            if not PHONE_RE.match(input.phone):
                 raise GraphQLError("Invalid phone format. Use +1234567890 or 123-456-7890.")
 
         customer = Customer.objects.create(
@@ -92,27 +101,18 @@ class BulkCreateCustomers(graphene.Mutation):
 
     @transaction.atomic
     def mutate(self, info, input):
-        created_customers = []
-        errors = []
-
-        for data in input:
-            try:
-                email = data.email.lower()
-
-                if Customer.objects.filter(email=email).exists():
-                    errors.append(f"Email '{email}' already exists.")
-                    continue
+        rows = [
+            {"name": data.name, "email": data.email.lower(), "phone": data.phone}
+            for data in input
+        ]
+        created_customers, rejected = bulk_create_customers(rows, PHONE_RE)
 
-                if data.phone and not re.match(r'^(\+\d{10,15}|\d{3}-\d{3}-\d{4})$', data.phone):
-                    errors.append(f"Invalid phone format for '{data.name}'.")
-                    continue
-
-                customer = Customer(name=data.name, email=email, phone=data.phone)
-                customer.save()
-                created_customers.append(customer)
-
-            except Exception as e:
-                errors.append(f"Error creating {data.name}: {str(e)}")
+        errors = []
+        for row, reason in rejected:
+            if reason == DUPLICATE_EMAIL:
+                errors.append(f"Email '{row['email']}' already exists.")
+            else:
+                errors.append(f"Invalid phone format for '{row['name']}'.")
 
         return BulkCreateCustomers(customers=created_customers, errors=errors)
 
@@ -156,24 +156,13 @@ class CreateOrder(graphene.Mutation):
         except Customer.DoesNotExist:
             raise GraphQLError("Invalid customer ID.")
 
-        # Validate products existence
-        products = Product.objects.filter(pk__in=input.product_ids)
-        if not products.exists():
+        quantities = order_quantities(input.product_ids, input.items)
+        if not quantities:
             raise GraphQLError("No valid products found.")
-        if len(products) != len(input.product_ids):
-            raise GraphQLError("One or more product IDs are invalid.")
 
-        # Calculate total amount
-        total_amount = sum([p.price for p in products])
-
-        # Create order
-        order = Order.objects.create(
-            customer=customer,
-            total_amount=total_amount,
-            order_date=input.order_date or timezone.now()
-        )
-        order.products.set(products)
-        order.save()
+        # Reserve stock and create the order with its line items; unknown
+        # product IDs are rejected there
+        order = place_order(customer, quantities, input.order_date)
 
         return CreateOrder(order=order)
 
@@ -1,6 +1,8 @@
 import graphene
 from graphene_django import DjangoObjectType
+from graphql import GraphQLError
 from crm.models import Product
+from crm.stock import restock_low_stock
 
 class ProductType(DjangoObjectType):
     class Meta:
@@ -9,19 +11,20 @@ class ProductType(DjangoObjectType):
 
 class UpdateLowStockProducts(graphene.Mutation):
     class Arguments:
-        pass  # ما فيش مدخلات
+        threshold = graphene.Int(default_value=10)
+        increment = graphene.Int(default_value=10)
 
     success = graphene.String()
     products = graphene.List(ProductType)
 
     @classmethod
-    def mutate(cls, root, info):
-        low_stock = Product.objects.filter(stock__lt=10)
-        updated_products = []
-        for product in low_stock:
-            product.stock += 10
-            product.save()
-            updated_products.append(product)
+    def mutate(cls, root, info, threshold, increment):
+        if threshold < 0:
+            raise GraphQLError("Threshold cannot be negative.")
+        if increment <= 0:
+            raise GraphQLError("Increment must be a positive number.")
+
+        updated_products = restock_low_stock(threshold=threshold, increment=increment)
 
         return UpdateLowStockProducts(
             success="Low stock products updated successfully!",
@@ -47,9 +50,18 @@ CRONJOBS = [
 from celery import crontab
 
 CELERY_BROKER_URL = "redis://localhost:6379/0"
+# Chunked workflows are chords, which need a result backend
+CELERY_RESULT_BACKEND = "redis://localhost:6379/1"
 CELERY_BEAT_SCHEDULE = {
     'generate-crm-report': {
         'task': 'crm.tasks.generate_crm_report',
         'schedule': crontab(day_of_week='mon', hour=6, minute=0),
     },
+    # Recounts the customers the incremental runs' id watermark skipped
+    # (inserts committed after a higher id was counted) and rebuilds the rollup
+    'generate-crm-report-full': {
+        'task': 'crm.tasks.generate_crm_report',
+        'schedule': crontab(day_of_week='sun', hour=3, minute=0),
+        'kwargs': {'full': True},
+    },
 }
@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import events, jobs, sales
+from .catalogue import invalidate_catalogue
+from .models import Customer, Order, OrderItem, Product, order_lines_total
+
+# Sent after queryset.update() calls that change products (no post_save fires)
+catalogue_changed = Signal()
+
+
+def _snapshot_unit_prices(items):
+    """Lines added through the related manager take the product's current price."""
+    price = Product.objects.filter(pk=OuterRef("product_id")).values("price")
+    items.filter(unit_price__isnull=True).update(unit_price=Subquery(price))
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def update_order_total(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep Order.total_amount in step with its line items incrementally:
+    only the added/removed lines are summed, and the total is moved with a
+    single UPDATE ... SET total_amount = total_amount +/- (subquery).
+    Removals are applied in the pre_* signals, while the lines still exist.
+    """
+    if action == "post_add" and pk_set:
+        if reverse:
+            _snapshot_unit_prices(OrderItem.objects.filter(product=instance, order_id__in=pk_set))
+            orders, delta = Order.objects.filter(pk__in=pk_set), order_lines_total([instance.pk])
+        else:
+            _snapshot_unit_prices(OrderItem.objects.filter(order=instance, product_id__in=pk_set))
+            orders, delta = Order.objects.filter(pk=instance.pk), order_lines_total(pk_set)
+        orders.update(total_amount=F("total_amount") + delta)
+    elif action == "pre_remove" and pk_set:
+        if reverse:
+            orders, delta = Order.objects.filter(pk__in=pk_set), order_lines_total([instance.pk])
+        else:
+            orders, delta = Order.objects.filter(pk=instance.pk), order_lines_total(pk_set)
+        orders.update(total_amount=F("total_amount") - delta)
+    elif action == "pre_clear" and reverse:
+        orders = Order.objects.filter(items__product=instance)
+        orders.update(total_amount=F("total_amount") - order_lines_total([instance.pk]))
+    elif action == "post_clear" and not reverse:
+        Order.objects.filter(pk=instance.pk).update(total_amount=0)
+    else:
+        return
+
+    if not reverse:
+        instance.refresh_from_db(fields=["total_amount"])
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def refresh_daily_sales(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Line edits move the revenue and units of orders already rolled up:
+    recompute their days once the lines have changed.
+    """
+    if action == "pre_clear" and reverse:
+        # Which orders lose the product is unknown after the clear
+        instance._cleared_order_days = sales.order_days(Order.objects.filter(items__product=instance))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            days = [sales.order_day(instance)]
+        elif action == "post_clear":
+            days = instance.__dict__.pop("_cleared_order_days", ())
+        else:
+            days = sales.order_days(Order.objects.filter(pk__in=pk_set))
+        sales.refresh_days(days)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_day(sender, instance, **kwargs):
+    """Keep the day a saved order was rolled up in, in case order_date moves it."""
+    if not instance._state.adding:
+        previous = Order.objects.filter(pk=instance.pk).values_list("order_date", flat=True).first()
+        instance._previous_order_day = previous and timezone.localdate(previous)
+
+
+@receiver(post_save, sender=Order)
+def update_daily_sales(sender, instance, created, **kwargs):
+    """New orders are added to their day; saved changes recompute it (and the day it left)."""
+    if created:
+        sales.record_order(instance)
+    else:
+        previous = instance.__dict__.pop("_previous_order_day", None)
+        sales.refresh_days({sales.order_day(instance), previous} - {None})
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_daily_sales(sender, instance, **kwargs):
+    """Deleted orders, including ones cascaded from their customer, leave their day."""
+    sales.refresh_deleted(instance)
+
+
+@receiver(post_delete, sender=Customer)
+def recount_report_customers(sender, instance, **kwargs):
+    """
+    The report's running customer total only adds ids above its watermark,
+    so any deletion (admin, shell, cascades) makes its next run recount.
+    """
+    if not sales.caller_rebuilds():
+        jobs.report_changed()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(catalogue_changed)
+def invalidate_product_cache(sender, **kwargs):
+    """
+    Drop every cached product lookup. The version is bumped again on commit
+    so rows cached by a concurrent reader before the commit are dropped too.
+    """
+    invalidate_catalogue()
+    transaction.on_commit(invalidate_catalogue)
+
+
+@receiver(post_save, sender=Product)
+def publish_low_stock(sender, instance, **kwargs):
+    if instance.stock < events.LOW_STOCK_THRESHOLD:
+        events.stock_below_threshold([{"id": instance.pk, "name": instance.name, "stock": instance.stock}])
@@ -0,0 +1,79 @@
+from datetime import time
+from decimal import Decimal
+
+from django.db.models import Count, DateField, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce, Trunc, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import sales
+from .models import Customer, Order
+
+TRUNCATE = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+
+
+def _order_totals():
+    return {
+        "order_count": Count("id"),
+        "revenue": Coalesce(
+            Sum("total_amount"), Value(Decimal("0.00")), output_field=DecimalField()
+        ),
+    }
+
+
+def _local_day(value):
+    """The date ``value`` opens when it is a local midnight, else None."""
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    local = timezone.localtime(value)
+    return local.date() if local.time() == time.min else None
+
+
+def crm_stats(since=None, until=None, group_by=None):
+    """
+    Customer count, order count and revenue computed with SQL aggregates.
+
+    ``since``/``until`` bound ``order_date`` (inclusive/exclusive) and
+    ``group_by`` ("day", "week" or "month") adds per-period buckets.
+    Bounds falling on local midnights (or left open) are served from the
+    DailySales rollup, a row per day; others aggregate the orders.
+    """
+    since_day, until_day = (value and _local_day(value) for value in (since, until))
+    if (since is None or since_day) and (until is None or until_day):
+        return _rollup_stats(since_day, until_day, group_by)
+
+    orders = Order.objects.all()
+    if since is not None:
+        orders = orders.filter(order_date__gte=since)
+    if until is not None:
+        orders = orders.filter(order_date__lt=until)
+
+    stats = orders.aggregate(**_order_totals())
+    stats["customer_count"] = Customer.objects.count()
+    stats["buckets"] = []
+
+    if group_by is not None:
+        stats["buckets"] = list(
+            orders.annotate(period=TRUNCATE[group_by]("order_date"))
+            .values("period")
+            .annotate(**_order_totals())
+            .order_by("period")
+        )
+    return stats
+
+
+def _rollup_stats(since, until, group_by):
+    stats = sales.totals(since, until)
+    stats["customer_count"] = Customer.objects.count()
+    stats["buckets"] = []
+
+    if group_by is not None:
+        buckets = (
+            sales.days_between(since, until)
+            .annotate(period=Trunc("date", group_by, output_field=DateField()))
+            .values("period")
+            .annotate(order_count=Sum("order_count"), revenue=Sum("revenue"))
+            .order_by("period")
+        )
+        # Periods start at local midnight, as when truncating order_date
+        stats["buckets"] = [{**bucket, "period": sales.day_start(bucket["period"])} for bucket in buckets]
+    return stats
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .jobs import RESTOCK_JOB, WATERMARK_LAG, job_state
+from .models import Product
+from .signals import catalogue_changed
+
+RESTOCK_CHUNK_SIZE = getattr(settings, "CRM_RESTOCK_CHUNK_SIZE", 500)
+
+
+def restock_low_stock(
+    threshold=10, increment=10, chunk_size=RESTOCK_CHUNK_SIZE, changed_since=None, id_range=None
+):
+    """
+    Add ``increment`` to every product with ``stock < threshold`` (and
+    ``updated_at >= changed_since``, ``after < id <= upto`` for an
+    ``id_range`` of ``(after, upto)`` when given).
+
+    Products are processed in id order, ``chunk_size`` at a time, each chunk
+    being one ``UPDATE ... SET stock = stock + N`` in its own short
+    transaction. The condition is repeated in the UPDATE so rows restocked
+    concurrently are not bumped twice. Returns the updated products.
+    """
+    low_stock = Product.objects.filter(stock__lt=threshold).order_by("id")
+    if changed_since is not None:
+        low_stock = low_stock.filter(updated_at__gte=changed_since)
+    if id_range is not None:
+        low_stock = low_stock.filter(id__gt=id_range[0], id__lte=id_range[1])
+    restocked = []
+    last_id = 0
+
+    while True:
+        ids = list(low_stock.filter(id__gt=last_id).values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            break
+        last_id = ids[-1]
+
+        with transaction.atomic():
+            # The timestamp marks the rows this UPDATE matched, so products
+            # restocked concurrently since the id lookup are not returned
+            now = timezone.now()
+            if Product.objects.filter(id__in=ids, stock__lt=threshold).update(
+                stock=F("stock") + increment, updated_at=now
+            ):
+                restocked.extend(Product.objects.filter(id__in=ids, updated_at=now).order_by("id"))
+
+    if restocked:
+        catalogue_changed.send(sender=Product)
+    return restocked
+
+
+def incremental_restock(threshold=10, increment=10, full=False):
+    """
+    Restock only the products changed since the previous run: stock can
+    only drop below the threshold through a write, which moves updated_at.
+    A run with a different threshold than the last one scans everything.
+    """
+    started = timezone.now()
+    with job_state(RESTOCK_JOB, full) as state:
+        changed_since = state.last_timestamp if state.totals.get("threshold") == threshold else None
+
+    # Chunks commit on their own, as in a full run; the watermark only
+    # moves once all of them are done
+    restocked = restock_low_stock(threshold, increment, changed_since=changed_since)
+
+    with job_state(RESTOCK_JOB) as state:
+        state.last_timestamp = started - WATERMARK_LAG
+        state.totals = {"threshold": threshold}
+    return restocked
@@ -1,3 +1,1181 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from celery import current_app
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from gql import gql
+from gql.transport.requests import RequestsHTTPTransport
+from graphql import execute as graphql_execute, parse, print_schema
+
+from alx_backend_graphql_crm.schema import schema
+from . import catalogue, events, graphql_client, jobs, sales, tasks
+from .catalogue import catalogue_stats
+from .complexity import operation_cost
+from .documents import document_cache, query_hash
+from .loaders import Loaders
+from .models import ChunkResult, Customer, DailyProductSales, DailySales, Product, Order
+from .orders import place_order
+from .sales import rebuild_daily_sales
+from .stock import incremental_restock, restock_low_stock
+from .tracing import field_histogram
+
+
+def create_orders(count, products_per_order=2):
+    products = [
+        Product.objects.create(name=f"Product {i}", price="10.00", stock=20)
+        for i in range(products_per_order)
+    ]
+    offset = Customer.objects.count()
+    for i in range(offset, offset + count):
+        customer = Customer.objects.create(name=f"Customer {i}", email=f"c{i}@example.com")
+        order = Order.objects.create(customer=customer)
+        order.products.set(products)
+
+
+class OrderLoaderTests(TestCase):
+    query = """
+        query {
+            orders {
+                id
+                customer { email }
+                products { name }
+            }
+        }
+    """
+
+    def execute(self):
+        result = schema.execute(self.query, context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+        return result.data["orders"]
+
+    def test_query_count_is_constant_in_number_of_orders(self):
+        # orders joined with customers + prefetched products
+        create_orders(3)
+        with self.assertNumQueries(2):
+            orders = self.execute()
+        self.assertEqual(len(orders), 3)
+
+        create_orders(30)
+        with self.assertNumQueries(2):
+            orders = self.execute()
+        self.assertEqual(len(orders), 33)
+        self.assertEqual(len(orders[-1]["products"]), 2)
+
+    def test_loaders_batch_each_level(self):
+        create_orders(10)
+        orders = list(Order.objects.all())
+        loaders = Loaders()
+        loaders.customer.prime(o.customer_id for o in orders)
+        loaders.order_product_ids.prime(o.pk for o in orders)
+
+        # customers + order->product links + products
+        with self.assertNumQueries(3):
+            for order in orders:
+                self.assertIsNotNone(loaders.customer.load(order.customer_id))
+                self.assertEqual(len(loaders.products_for_order(order.pk)), 2)
+
+    def test_related_fields_are_not_loaded_unless_selected(self):
+        create_orders(5)
+        with self.assertNumQueries(1):
+            result = schema.execute("query { orders { id } }", context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+
+
+class QueryPlannerTests(TestCase):
+    def test_orders_reads_only_requested_columns(self):
+        create_orders(2)
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute("query { orders { id totalAmount } }")
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"]
+        self.assertIn('"total_amount"', sql)
+        self.assertNotIn('"order_date"', sql)
+        self.assertNotIn("JOIN", sql)
+
+    def test_nested_selection_joins_and_prunes_related_columns(self):
+        create_orders(2)
+        query = """
+            query {
+                orders {
+                    customer { ...CustomerFields }
+                }
+            }
+            fragment CustomerFields on CustomerType { email }
+        """
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(query, context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"]
+        self.assertIn("JOIN", sql)
+        self.assertIn('"email"', sql)
+        self.assertNotIn('"phone"', sql)
+
+
+    def test_reverse_fk_prefetch_loads_the_parent_column(self):
+        create_orders(10)
+        queries = (
+            "{ orders { items { quantity } } }",
+            "{ allOrders(first: 10) { edges { node { items { quantity } } } } }",
+        )
+        for query in queries:
+            with self.assertNumQueries(2):
+                result = schema.execute(query, context_value=SimpleNamespace())
+            self.assertIsNone(result.errors)
+
+class KeysetPaginationTests(TestCase):
+    query = """
+        query ($first: Int, $after: String) {
+            allOrders(first: $first, after: $after) {
+                edges { cursor node { id } }
+                pageInfo { hasNextPage endCursor }
+            }
+        }
+    """
+
+    def test_pages_walk_every_order_once(self):
+        create_orders(7)
+        seen, after = [], None
+        while True:
+            result = schema.execute(self.query, variables={"first": 3, "after": after})
+            self.assertIsNone(result.errors)
+            page = result.data["allOrders"]
+            seen += [edge["node"]["id"] for edge in page["edges"]]
+            if not page["pageInfo"]["hasNextPage"]:
+                break
+            after = page["pageInfo"]["endCursor"]
+
+        expected = Order.objects.order_by("order_date", "id").values_list("id", flat=True)
+        self.assertEqual(seen, [str(pk) for pk in expected])
+
+    def test_total_count_is_only_computed_when_selected(self):
+        create_orders(4)
+        with self.assertNumQueries(1):
+            schema.execute("query { allCustomers(first: 2) { edges { node { id } } } }")
+        with self.assertNumQueries(2):
+            result = schema.execute("query { allCustomers(first: 2) { totalCount } }")
+        self.assertEqual(result.data["allCustomers"]["totalCount"], 4)
+
+    def test_page_size_is_capped(self):
+        result = schema.execute("query { allProducts(first: 100000) { edges { cursor } } }")
+        self.assertIn("page size limit", result.errors[0].message)
+
+
+class CrmStatsTests(TestCase):
+    def test_stats_are_aggregated_in_one_query_per_value(self):
+        create_orders(3)
+        query = "query { crmStats(groupBy: DAY) { customerCount orderCount revenue buckets { orderCount revenue } } }"
+        # order aggregates + customer count + daily buckets
+        with self.assertNumQueries(3):
+            result = schema.execute(query)
+        self.assertIsNone(result.errors)
+        stats = result.data["crmStats"]
+        self.assertEqual(stats["customerCount"], 3)
+        self.assertEqual(stats["orderCount"], 3)
+        self.assertEqual(Decimal(stats["revenue"]), Decimal("60.00"))
+        self.assertEqual(len(stats["buckets"]), 1)
+        self.assertEqual(stats["buckets"][0]["orderCount"], 3)
+
+
+class BulkCreateCustomersTests(TestCase):
+    mutation = """
+        mutation ($input: [JSONString]!) {
+            bulkCreateCustomers(input: $input) {
+                customers { email }
+                errors
+            }
+        }
+    """
+
+    def test_rows_are_validated_and_inserted_as_a_set(self):
+        Customer.objects.create(name="Existing", email="taken@example.com")
+        rows = [
+            {"name": "A", "email": "a@example.com", "phone": "+1234567890"},
+            {"name": "B", "email": "taken@example.com"},
+            {"name": "C", "email": "a@example.com"},
+            {"name": "D", "email": "d@example.com", "phone": "not a phone"},
+            {"email": "e@example.com"},
+            "not an object",
+            {"name": "G", "email": 7},
+            {"name": "F", "email": "f@example.com"},
+        ]
+        variables = {"input": [json.dumps(row) for row in rows]}
+
+        # savepoint + email lookup + insert + release
+        with self.assertNumQueries(4):
+            result = schema.execute(self.mutation, variables=variables)
+        self.assertIsNone(result.errors)
+
+        payload = result.data["bulkCreateCustomers"]
+        self.assertEqual([c["email"] for c in payload["customers"]], ["a@example.com", "f@example.com"])
+        # Reported in input order
+        self.assertEqual(payload["errors"], [
+            "Email already exists: taken@example.com",
+            "Email already exists: a@example.com",
+            "Invalid phone format: not a phone",
+            "Missing field: 'name'",
+            "Invalid customer: expected an object, got str",
+            "Invalid field: 'email' must be a string",
+        ])
+
+
+class UpdateLowStockProductsTests(TestCase):
+    mutation = """
+        mutation ($threshold: Int, $increment: Int) {
+            updateLowStockProducts(threshold: $threshold, increment: $increment) {
+                products { name stock }
+            }
+        }
+    """
+
+    def test_threshold_and_increment_are_arguments(self):
+        for stock in (0, 4, 5, 12):
+            Product.objects.create(name=f"Stock {stock}", price="1.00", stock=stock)
+
+        result = schema.execute(self.mutation, variables={"threshold": 5, "increment": 20})
+        self.assertIsNone(result.errors)
+
+        products = result.data["updateLowStockProducts"]["products"]
+        self.assertEqual(products, [
+            {"name": "Stock 0", "stock": 20},
+            {"name": "Stock 4", "stock": 24},
+        ])
+        self.assertEqual(Product.objects.get(name="Stock 5").stock, 5)
+
+    def test_chunks_cover_every_low_stock_product(self):
+        for i in range(5):
+            Product.objects.create(name=f"P{i}", price="1.00", stock=1)
+        # per chunk: id lookup, savepoint, update, re-read, release; then one empty lookup
+        with self.assertNumQueries(3 * 5 + 1):
+            restocked = restock_low_stock(chunk_size=2)
+        self.assertEqual([p.stock for p in restocked], [11] * 5)
+
+    def test_rows_restocked_concurrently_are_not_returned(self):
+        first = Product.objects.create(name="First", price="1.00", stock=1)
+        Product.objects.create(name="Second", price="1.00", stock=1)
+        raced = False
+
+        def concurrent_restock(execute, sql, params, many, context):
+            # Another run restocks First between the id lookup and the UPDATE
+            nonlocal raced
+            if sql.startswith("UPDATE") and not raced:
+                raced = True
+                Product.objects.filter(pk=first.pk).update(stock=11)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(concurrent_restock):
+            restocked = restock_low_stock()
+        self.assertEqual([(p.name, p.stock) for p in restocked], [("Second", 11)])
+
+
+class DocumentCacheTests(TestCase):
+    query = "query { customers { id } }"
+
+    def setUp(self):
+        document_cache.clear()
+
+    def post(self, payload):
+        return self.client.post("/graphql", json.dumps(payload), content_type="application/json")
+
+    def test_repeated_queries_are_parsed_once(self):
+        for _ in range(3):
+            self.assertEqual(self.post({"query": self.query}).status_code, 200)
+        stats = self.client.get("/graphql/stats").json()["document_cache"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (2, 1, 1))
+
+    def test_automatic_persisted_queries(self):
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": query_hash(self.query)}}
+
+        response = self.post({"extensions": extensions})
+        self.assertEqual(response.json()["errors"][0]["message"], "PersistedQueryNotFound")
+
+        response = self.post({"query": self.query, "extensions": extensions})
+        self.assertEqual(response.json()["data"], {"customers": []})
+
+        response = self.post({"extensions": extensions})
+        self.assertEqual(response.json()["data"], {"customers": []})
+
+    def test_hash_must_match_query(self):
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": "0" * 64}}
+        response = self.post({"query": self.query, "extensions": extensions})
+        self.assertEqual(response.json()["errors"][0]["message"], "provided sha does not match query")
+
+    def test_malformed_persisted_query_extension(self):
+        for extensions in ({"persistedQuery": "abc"}, ["abc"], "[1]", {"persistedQuery": {"sha256Hash": [1]}}):
+            response = self.post({"query": self.query, "extensions": extensions})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["errors"][0]["message"], "Invalid persistedQuery extension.")
+
+
+class GraphQLClientTests(TestCase):
+    def test_sdl_file_matches_schema(self):
+        # Regenerate with: manage.py graphql_schema --out crm/schema.graphql
+        self.assertEqual(print_schema(schema.graphql_schema), graphql_client.load_schema())
+
+    def test_session_is_created_once_per_process(self):
+        self.addCleanup(graphql_client.close)
+        graphql_client.close()
+        session = graphql_client.get_session()
+        self.assertIs(graphql_client.get_session(), session)
+        self.assertIsNotNone(session.client.schema.get_type("CrmStatsType"))
+
+    def test_local_transport_runs_in_process(self):
+        create_orders(2)
+        self.addCleanup(graphql_client.close)
+        graphql_client.close()
+
+        with self.settings(CRM_GRAPHQL_TRANSPORT="local"):
+            result = graphql_client.execute(gql("query { crmStats { orderCount } }"))
+        self.assertIsInstance(graphql_client.get_session().transport, graphql_client.SchemaTransport)
+        self.assertEqual(result, {"crmStats": {"orderCount": 2}})
+
+    def test_http_transport_is_the_fallback(self):
+        self.addCleanup(graphql_client.close)
+        graphql_client.close()
+
+        with self.settings(CRM_GRAPHQL_TRANSPORT="http"):
+            session = graphql_client.get_session()
+        self.assertIsInstance(session.transport, RequestsHTTPTransport)
+
+
+class OrderRemindersTests(TestCase):
+    async def test_reminds_each_customer_once_across_pages(self):
+        from crm.cron_jobs.send_order_reminders import send_reminders
+
+        await sync_to_async(create_orders)(3)
+        customer = await Customer.objects.afirst()
+        for _ in range(3):
+            await Order.objects.acreate(customer=customer, total_amount="5.00")
+
+        class InProcessSession:
+            async def execute(self, request, variable_values):
+                result = await sync_to_async(graphql_execute)(
+                    schema.graphql_schema, request.document, variable_values=variable_values,
+                    context_value=SimpleNamespace(),
+                )
+                assert not result.errors, result.errors
+                return result.data
+
+        reminded = []
+
+        async def remind(order_id, email):
+            reminded.append(email)
+
+        since = "2000-01-01T00:00:00+00:00"
+        count = await send_reminders(InProcessSession(), since, remind, concurrency=3, page_size=2)
+        self.assertEqual(count, 3)
+        self.assertEqual(sorted(reminded), ["c0@example.com", "c1@example.com", "c2@example.com"])
+
+
+class CleanInactiveCustomersTests(TestCase):
+    def test_deletes_inactive_customers_in_batches(self):
+        create_orders(5)
+        stale = timezone.now() - timedelta(days=400)
+        Order.objects.filter(customer__email__in=["c0@example.com", "c1@example.com", "c2@example.com"]).update(
+            order_date=stale
+        )
+        Customer.objects.create(name="Never ordered", email="never@example.com")
+
+        out = StringIO()
+        call_command("clean_inactive_customers", "--dry-run", stdout=out)
+        self.assertIn("Would delete 4 inactive customers", out.getvalue())
+        self.assertEqual(Customer.objects.count(), 6)
+
+        out = StringIO()
+        call_command("clean_inactive_customers", "--batch-size", "3", stdout=out)
+        self.assertIn(
+            "Deleted 4 inactive customers (crm.Customer: 4, crm.Order: 3, crm.OrderItem: 6)",
+            out.getvalue(),
+        )
+        self.assertEqual(
+            sorted(Customer.objects.values_list("email", flat=True)), ["c3@example.com", "c4@example.com"]
+        )
+
+
+    def test_deleted_orders_are_rebuilt_once_not_per_order(self):
+        for customers in (5, 50):
+            create_orders(customers)
+            Order.objects.update(order_date=timezone.now() - timedelta(days=400))
+            rebuild_daily_sales()
+
+            # Batch lookups, the deletes and one rebuild of the stale day, whatever the order count
+            with self.assertNumQueries(17):
+                call_command("clean_inactive_customers", stdout=StringIO())
+            self.assertFalse(Customer.objects.exists())
+            self.assertFalse(DailySales.objects.exists())
+
+class OrderTotalTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Buyer", email="buyer@example.com")
+        self.phone = Product.objects.create(name="Phone", price=Decimal("500.00"), stock=5)
+        self.tablet = Product.objects.create(name="Tablet", price=Decimal("300.00"), stock=5)
+
+    def test_total_follows_product_changes(self):
+        order = Order.objects.create(customer=self.customer)
+        order.products.add(self.phone, self.tablet)
+        self.assertEqual(order.total_amount, Decimal("800.00"))
+
+        order.products.remove(self.tablet)
+        self.assertEqual(order.total_amount, Decimal("500.00"))
+
+        self.phone.order_set.clear()
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal("0.00"))
+
+        self.tablet.order_set.add(order)
+        order.refresh_from_db()
+        self.assertEqual(order.total_amount, Decimal("300.00"))
+
+    def test_create_order_writes_the_order_once(self):
+        mutation = """
+            mutation ($customerId: ID!, $productIds: [ID]!) {
+                createOrder(customerId: $customerId, productIds: $productIds) {
+                    order { totalAmount }
+                }
+            }
+        """
+        variables = {"customerId": self.customer.pk, "productIds": [self.phone.pk, self.tablet.pk]}
+        with CaptureQueriesContext(connection) as queries:
+            result = schema.execute(mutation, variables=variables, context_value=SimpleNamespace())
+        self.assertIsNone(result.errors)
+        self.assertEqual(Decimal(result.data["createOrder"]["order"]["totalAmount"]), Decimal("800.00"))
+        self.assertEqual(sum(q["sql"].startswith('INSERT INTO "crm_order"') for q in queries), 1)
+        self.assertFalse(any(q["sql"].startswith('UPDATE "crm_order"') for q in queries))
+
+    def test_recalculate_totals_fixes_historical_orders(self):
+        for _ in range(5):
+            order = Order.objects.create(customer=self.customer)
+            order.products.set([self.phone, self.tablet])
+        Order.objects.update(total_amount=0)
+
+        out = StringIO()
+        call_command("recalculate_totals", "--batch-size", "2", stdout=out)
+        self.assertIn("Recalculated totals for 5 orders", out.getvalue())
+        self.assertEqual(set(Order.objects.values_list("total_amount", flat=True)), {Decimal("800.00")})
+
+
+class StockReservationTests(TestCase):
+    mutation = """
+        mutation ($customerId: ID!, $items: [OrderItemInput]) {
+            createOrder(customerId: $customerId, items: $items) {
+                order { totalAmount items { product { name } quantity unitPrice } }
+            }
+        }
+    """
+
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Buyer", email="buyer@example.com")
+        self.phone = Product.objects.create(name="Phone", price=Decimal("500.00"), stock=3)
+        self.tablet = Product.objects.create(name="Tablet", price=Decimal("300.00"), stock=1)
+
+    def order(self, *lines):
+        items = [{"productId": product.pk, "quantity": quantity} for product, quantity in lines]
+        return schema.execute(
+            self.mutation,
+            variables={"customerId": self.customer.pk, "items": items},
+            context_value=SimpleNamespace(),
+        )
+
+    def test_lines_reserve_stock_and_snapshot_prices(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = self.order((self.phone, 2), (self.tablet, 1))
+        self.assertIsNone(result.errors)
+
+        order = result.data["createOrder"]["order"]
+        self.assertEqual(Decimal(order["totalAmount"]), Decimal("1300.00"))
+        self.assertEqual(order["items"][0]["quantity"], 2)
+        self.assertEqual(Decimal(order["items"][0]["unitPrice"]), Decimal("500.00"))
+
+        self.phone.refresh_from_db()
+        self.tablet.refresh_from_db()
+        self.assertEqual((self.phone.stock, self.tablet.stock), (1, 0))
+        self.assertEqual(sum(q["sql"].startswith('UPDATE "crm_product"') for q in queries), 1)
+
+    def test_oversell_is_rejected_and_nothing_is_reserved(self):
+        result = self.order((self.phone, 2), (self.tablet, 2))
+        self.assertEqual(
+            result.errors[0].message, "Insufficient stock for: Tablet (requested 2, available 1)."
+        )
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.stock, 3)
+        self.assertFalse(Order.objects.exists())
+
+
+class QueryPlanTests(TestCase):
+    """The hot background-job queries must be served by the crm indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        customers = Customer.objects.bulk_create(
+            Customer(name=f"Plan {i}", email=f"plan{i}@example.com") for i in range(200)
+        )
+        Product.objects.bulk_create(
+            Product(name=f"Plan {i}", price=Decimal("1.00"), stock=100 if i % 20 else 1) for i in range(400)
+        )
+        Order.objects.bulk_create(
+            Order(customer=customers[i % 200], order_date=now - timedelta(days=i % 730))
+            for i in range(2000)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_reminders_use_order_date_index(self):
+        since = timezone.now() - timedelta(days=7)
+        orders = Order.objects.filter(order_date__gte=since).order_by("order_date", "id")
+        self.assertUsesIndex(orders, "crm_order_date_idx")
+
+    def test_cleanup_subquery_uses_customer_order_date_index(self):
+        cutoff = timezone.now() - timedelta(days=365)
+        self.assertUsesIndex(jobs.inactive_customers(cutoff).order_by("pk"), "crm_order_cust_date_idx")
+
+    def test_restock_uses_low_stock_index(self):
+        low_stock = Product.objects.filter(stock__lt=10, id__gt=0).order_by("id")
+        self.assertUsesIndex(low_stock, "crm_product_low_stock_idx")
+
+
+class FilterTests(TestCase):
+    def setUp(self):
+        create_orders(4)
+        self.old = Order.objects.order_by("pk").first()
+        Order.objects.filter(pk=self.old.pk).update(order_date=timezone.now() - timedelta(days=30))
+
+    def test_order_date_and_customer_filters(self):
+        since = (timezone.now() - timedelta(days=7)).isoformat()
+        result = schema.execute(
+            "query ($since: DateTime) { orders(orderDate_Gte: $since) { id } }", variables={"since": since}
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(len(result.data["orders"]), 3)
+
+        result = schema.execute(
+            "query ($c: ID) { allOrders(customerId: $c) { edges { node { id } } } }",
+            variables={"c": self.old.customer_id},
+        )
+        self.assertEqual(result.data["allOrders"]["edges"], [{"node": {"id": str(self.old.pk)}}])
+
+    def test_product_ranges_and_name_prefix(self):
+        Product.objects.create(name="Widget", price=Decimal("3.00"), stock=2)
+        query = 'query { products(name_Startswith: "Wid", stock_Lt: 5, price_Lte: 10) { name } }'
+        result = schema.execute(query)
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["products"], [{"name": "Widget"}])
+
+    def test_empty_ranges_are_rejected(self):
+        result = schema.execute("query { products(price_Gte: 5, price_Lte: 1) { id } }")
+        self.assertIn("Empty range for price", result.errors[0].message)
+
+    def test_lists_are_capped_with_or_without_filters(self):
+        with mock.patch("crm.filters.LIST_LIMIT", 2):
+            for query in ("query { orders { id } }", "query { orders(totalAmount_Gte: 0) { id } }"):
+                result = schema.execute(query)
+                self.assertIsNone(result.errors)
+                self.assertEqual(len(result.data["orders"]), 2)
+
+            result = schema.execute('query { customers(email: "c1@example.com") { id } }')
+            self.assertEqual(len(result.data["customers"]), 1)
+
+
+class ProductCatalogueCacheTests(TestCase):
+    query = "query { products(stock_Gte: 0) { name stock } }"
+
+    def setUp(self):
+        catalogue.get_cache().clear()
+        catalogue_stats.clear()
+        self.customer = Customer.objects.create(name="Buyer", email="buyer@example.com")
+        self.phone = Product.objects.create(name="Phone", price=Decimal("500.00"), stock=3)
+
+    def products(self):
+        result = schema.execute(self.query)
+        self.assertIsNone(result.errors)
+        return result.data["products"]
+
+    def test_repeated_lookups_are_served_from_the_cache(self):
+        self.products()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.products(), [{"name": "Phone", "stock": 3}])
+        self.assertEqual((catalogue_stats.hits, catalogue_stats.misses), (1, 1))
+
+        self.assertEqual(catalogue.get_products([self.phone.pk]), [self.phone])
+        with self.assertNumQueries(0):
+            catalogue.get_products([self.phone.pk])
+
+    def test_product_writes_invalidate_cached_lookups(self):
+        self.products()
+        Product.objects.create(name="Tablet", price=Decimal("300.00"), stock=1)
+        self.assertEqual(len(self.products()), 2)
+
+        restock_low_stock(threshold=5, increment=10)
+        self.assertEqual({p["stock"] for p in self.products()}, {11, 13})
+
+        mutation = """
+            mutation ($customerId: ID!, $items: [OrderItemInput]) {
+                createOrder(customerId: $customerId, items: $items) { order { id } }
+            }
+        """
+        items = [{"productId": self.phone.pk, "quantity": 2}]
+        result = schema.execute(
+            mutation,
+            variables={"customerId": self.customer.pk, "items": items},
+            context_value=SimpleNamespace(),
+        )
+        self.assertIsNone(result.errors)
+        self.assertIn({"name": "Phone", "stock": 11}, self.products())
+
+
+    def test_orders_are_priced_from_the_database(self):
+        catalogue.get_products([self.phone.pk])
+        # A price change this process's cache does not hear about (another process, raw UPDATE)
+        Product.objects.filter(pk=self.phone.pk).update(price=Decimal("450.00"))
+        self.assertEqual(catalogue.get_products([self.phone.pk])[0].price, Decimal("500.00"))
+
+        order = place_order(self.customer, {self.phone.pk: 2})
+        self.assertEqual(order.total_amount, Decimal("900.00"))
+        self.assertEqual(order.items.get().unit_price, Decimal("450.00"))
+
+        result = schema.execute(
+            'mutation { createOrder(customerId: %d, productIds: ["999"]) { order { id } } }' % self.customer.pk,
+            context_value=SimpleNamespace(),
+        )
+        self.assertEqual(result.errors[0].message, "One or more product IDs are invalid.")
+
+class QueryCostTests(TestCase):
+    def post(self, query):
+        return self.client.post("/graphql", json.dumps({"query": query}), content_type="application/json")
+
+    def cost(self, query):
+        return operation_cost(schema.graphql_schema, parse(query))
+
+    def test_lists_multiply_their_selection(self):
+        # orders (capped at 1000) x (order 1 + customer 1 + products 50 x 1)
+        self.assertEqual(self.cost("{ orders { id customer { name } products { name } } }"),
+                         {"cost": 52000, "depth": 3})
+        # page of 10 x (edge 1 + node 1), plus the connection itself
+        query = "{ allOrders(first: 10) { edges { node { id } } } }"
+        self.assertEqual(self.cost(query), {"cost": 30, "depth": 4})
+        # aliases and fragments are counted like the fields they expand to
+        query = "{ a: customers { ...c } b: customers { ...c } } fragment c on CustomerType { id }"
+        self.assertEqual(self.cost(query)["cost"], 2000)
+
+    def test_cost_is_reported_in_extensions(self):
+        response = self.post("{ allCustomers(first: 5) { edges { node { id } } } }")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["extensions"]["cost"], {"cost": 15, "depth": 4})
+
+    def test_cost_is_estimated_once_per_cached_document(self):
+        document_cache.clear()
+        query = (
+            "query One { customers { id } } "
+            "query Two { allCustomers(first: 5) { edges { node { id } } } }"
+        )
+
+        def post(name):
+            payload = json.dumps({"query": query, "operationName": name})
+            return self.client.post("/graphql", payload, content_type="application/json")
+
+        self.assertEqual(post("One").json()["extensions"]["cost"], {"cost": 1000, "depth": 2})
+
+        with mock.patch("crm.complexity._selection_cost") as estimate:
+            response = post("Two")
+        estimate.assert_not_called()
+        self.assertEqual(response.json()["extensions"]["cost"], {"cost": 15, "depth": 4})
+
+    def test_budgets_reject_before_execution(self):
+        # Filters do not shrink the estimate: the list is only bounded by its cap
+        with self.assertNumQueries(0):
+            response = self.post("{ orders(totalAmount_Gte: 0) { customer { name } products { name } } }")
+        self.assertEqual(response.status_code, 400)
+        error = response.json()["errors"][0]
+        self.assertEqual(error["message"], "Query cost 52000 exceeds the limit of 10000.")
+
+        with mock.patch("crm.complexity.MAX_QUERY_DEPTH", 2):
+            response = self.post("{ orders { customer { name } } }")
+        self.assertEqual(response.json()["errors"][0]["extensions"]["code"], "QUERY_TOO_DEEP")
+
+
+class TracingTests(TestCase):
+    query = "{ orders { id customer { name } } }"
+
+    def setUp(self):
+        field_histogram.clear()
+        create_orders(2)
+
+    def post(self, **headers):
+        response = self.client.post(
+            "/graphql", json.dumps({"query": self.query}), content_type="application/json", headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_trace_header_returns_resolver_and_sql_timings(self):
+        tracing = self.post(**{"X-CRM-Trace": "1"})["extensions"]["tracing"]
+        resolvers = {tuple(r["path"]): r for r in tracing["execution"]["resolvers"]}
+
+        # The orders list (joined with customers) is charged to the orders field
+        self.assertEqual(resolvers[("orders",)]["sqlCount"], 1)
+        self.assertEqual(resolvers[("orders", 0, "customer")]["sqlCount"], 0)
+        self.assertEqual(tracing["sql"]["count"], 1)
+
+        fields = self.client.get("/graphql/stats").json()["resolvers"]["fields"]
+        self.assertEqual(fields["Query.orders"]["count"], 1)
+        self.assertEqual(fields["OrderType.customer"]["count"], 2)
+        self.assertEqual(sum(fields["CustomerType.name"]["buckets"]), 2)
+
+    def test_unsampled_requests_are_not_traced(self):
+        with mock.patch("crm.tracing.SAMPLE_RATE", 0):
+            body = self.post()
+        self.assertNotIn("tracing", body["extensions"])
+        self.assertEqual(field_histogram.stats()["fields"], {})
+
+        with mock.patch("crm.tracing.SAMPLE_RATE", 1):
+            body = self.post()
+        self.assertNotIn("tracing", body["extensions"])
+        self.assertEqual(field_histogram.stats()["fields"]["Query.orders"]["count"], 1)
+
+
+class SeedCrmTests(TestCase):
+    def test_seeds_consistent_orders(self):
+        out = StringIO()
+        call_command("seed_crm", customers=20, products=10, orders=50, batch_size=16, stdout=out)
+        self.assertIn("Seeded 20 customers, 10 products, 50 orders", out.getvalue())
+
+        self.assertEqual(Order.objects.count(), 50)
+        self.assertFalse(Order.objects.filter(items__isnull=True).exists())
+        # Stored totals match the line items
+        out = StringIO()
+        totals = dict(Order.objects.values_list("pk", "total_amount"))
+        call_command("recalculate_totals", stdout=out)
+        self.assertEqual(dict(Order.objects.values_list("pk", "total_amount")), totals)
+        # The seeded orders were rolled up
+        self.assertEqual(sales.totals()["order_count"], 50)
+        self.assertEqual(sales.totals()["revenue"], sum(totals.values()))
+
+        # Repeated runs continue after the existing customers
+        call_command("seed_crm", customers=5, products=0, orders=0, stdout=StringIO())
+        self.assertEqual(Customer.objects.count(), 25)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        create_orders(3)
+        self.old = Order.objects.order_by("pk").first()
+        Order.objects.filter(pk=self.old.pk).update(order_date=timezone.now() - timedelta(days=30))
+
+    def content(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_csv_and_ndjson_use_the_graphql_filters(self):
+        since = (timezone.now() - timedelta(days=7)).isoformat()
+        response = self.client.get("/export/orders.csv", {"orderDate_Gte": since})
+        lines = self.content(response).decode().splitlines()
+        self.assertEqual(lines[0], "id,customer_id,customer_email,order_date,total_amount")
+        self.assertEqual(len(lines), 3)
+
+        response = self.client.get("/export/customers.ndjson", {"email": "c0@example.com"})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row["email"] for row in rows], ["c0@example.com"])
+
+    def test_gzip_and_invalid_requests(self):
+        response = self.client.get("/export/customers.csv", {"gzip": "1"})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual(len(gzip.decompress(self.content(response)).splitlines()), 4)
+
+        response = self.client.get("/export/orders.csv", {"totalAmount_Gte": "lots"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Invalid value for totalAmount_Gte.")
+        self.assertEqual(self.client.get("/export/products.xml").status_code, 404)
+
+    async def test_asgi_streams_without_buffering(self):
+        response = await self.async_client.get("/export/customers.csv")
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.splitlines()), 4)
+
+
+class AsyncGraphQLViewTests(TransactionTestCase):
+    query = """
+        query ($email: String) {
+            customers(email: $email) { name }
+            products(stock_Gte: 0) { name }
+            crmStats { customerCount orderCount }
+        }
+    """
+
+    def setUp(self):
+        catalogue.get_cache().clear()
+        create_orders(2)
+
+    async def post(self, path, query, variables=None):
+        response = await self.async_client.post(
+            path, json.dumps({"query": query, "variables": variables}), content_type="application/json"
+        )
+        return response.status_code, json.loads(response.content)
+
+    async def test_matches_the_sync_view(self):
+        variables = {"email": "c1@example.com"}
+        status, body = await self.post("/graphql/async", self.query, variables)
+        self.assertEqual(status, 200)
+        self.assertEqual(body["data"]["customers"], [{"name": "Customer 1"}])
+        self.assertEqual(body["data"]["crmStats"], {"customerCount": 2, "orderCount": 2})
+
+        sync_post = sync_to_async(self.client.post)
+        response = await sync_post(
+            "/graphql", json.dumps({"query": self.query, "variables": variables}), content_type="application/json"
+        )
+        self.assertEqual(body["data"], response.json()["data"])
+
+    async def test_concurrent_root_fields_are_traced_separately(self):
+        query = "{ customers { name } orders { id } crmStats { customerCount } }"
+        response = await self.async_client.post(
+            "/graphql/async", json.dumps({"query": query}), content_type="application/json",
+            headers={"X-CRM-Trace": "1"},
+        )
+        tracing = json.loads(response.content)["extensions"]["tracing"]
+        roots = {r["fieldName"]: r for r in tracing["execution"]["resolvers"] if len(r["path"]) == 1}
+
+        self.assertEqual(roots["customers"]["sqlCount"], 1)
+        self.assertEqual(roots["orders"]["sqlCount"], 1)
+        self.assertGreaterEqual(roots["crmStats"]["sqlCount"], 1)
+        self.assertEqual(sum(r["sqlCount"] for r in tracing["execution"]["resolvers"]), tracing["sql"]["count"])
+
+    async def test_mutations_and_errors(self):
+        mutation = 'mutation { createCustomer(name: "Async", email: "async@example.com") { customer { name } } }'
+        status, body = await self.post("/graphql/async", mutation)
+        self.assertEqual(body["data"]["createCustomer"]["customer"], {"name": "Async"})
+        self.assertTrue(await Customer.objects.filter(email="async@example.com").aexists())
+
+        status, body = await self.post("/graphql/async", "{ nope }")
+        self.assertEqual(status, 400)
+        self.assertIn("Cannot query field 'nope'", body["errors"][0]["message"])
+
+
+class SubscriptionTests(TestCase):
+    async def first_event(self, query, channel, *messages):
+        stream = await schema.subscribe(query)
+        pending = asyncio.ensure_future(anext(stream))
+        while not events.broker._subscribers[channel]:
+            await asyncio.sleep(0)
+        for message in messages:
+            events.broker.publish(channel, message)
+        result = await asyncio.wait_for(pending, 1)
+        await stream.aclose()
+        return result
+
+    async def test_order_created(self):
+        result = await self.first_event(
+            "subscription { orderCreated { id totalAmount orderDate } }",
+            events.ORDER_CREATED,
+            {"id": 7, "customer_id": 1, "total_amount": "12.50", "order_date": "2026-01-02T03:04:05+00:00"},
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["orderCreated"]["id"], "7")
+        self.assertEqual(result.data["orderCreated"]["totalAmount"], "12.50")
+
+    async def test_stock_below_threshold_filters_and_validates(self):
+        result = await self.first_event(
+            "subscription { stockBelowThreshold(threshold: 5) { name stock } }",
+            events.STOCK_BELOW_THRESHOLD,
+            {"id": 1, "name": "Mouse", "stock": 8},
+            {"id": 2, "name": "Cable", "stock": 3},
+        )
+        self.assertEqual(result.data["stockBelowThreshold"], {"name": "Cable", "stock": 3})
+
+        result = await schema.subscribe("subscription { stockBelowThreshold(threshold: 11) { name } }")
+        self.assertEqual(result.errors[0].message, "Threshold cannot be above 10")
+
+    def test_orders_and_low_stock_are_published_on_commit(self):
+        customer = Customer.objects.create(name="Buyer", email="buyer@example.com")
+        phone = Product.objects.create(name="Phone", price=Decimal("500.00"), stock=30)
+        cable = Product.objects.create(name="Cable", price=Decimal("5.00"), stock=12)
+
+        with mock.patch.object(events.broker, "publish") as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                order = place_order(customer, {phone.pk: 1, cable.pk: 4})
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual(
+            [call.args for call in publish.call_args_list],
+            [
+                (events.STOCK_BELOW_THRESHOLD, {"id": cable.pk, "name": "Cable", "stock": 8}),
+                (events.ORDER_CREATED, {
+                    "id": order.pk,
+                    "customer_id": customer.pk,
+                    "total_amount": "520.00",
+                    "order_date": order.order_date.isoformat(),
+                }),
+            ],
+        )
+
+
+class IncrementalJobTests(TestCase):
+    report = "mutation ($full: Boolean!) { updateCrmReport(full: $full) { customerCount orderCount revenue } }"
+
+    def run_report(self, full=False):
+        job = SimpleNamespace(job_access=True)
+        result = schema.execute(self.report, variables={"full": full}, context_value=job)
+        self.assertIsNone(result.errors)
+        report = result.data["updateCrmReport"]
+        return {**report, "revenue": Decimal(report["revenue"])}
+
+    def test_report_reads_new_customers_and_the_rollup(self):
+        create_orders(2)
+        self.assertEqual(self.run_report(), {"customerCount": 2, "orderCount": 2, "revenue": Decimal("40.00")})
+
+        create_orders(1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.run_report(), {"customerCount": 3, "orderCount": 3, "revenue": Decimal("60.00")})
+        self.assertFalse(any('"crm_order"' in q["sql"] for q in queries))
+
+        # Any customer deletion makes the next run recount
+        Customer.objects.get(email="c0@example.com").delete()
+        self.assertEqual(self.run_report(), {"customerCount": 2, "orderCount": 2, "revenue": Decimal("40.00")})
+        self.assertEqual(self.run_report(full=True), {"customerCount": 2, "orderCount": 2, "revenue": Decimal("40.00")})
+
+    def test_job_operations_need_staff_or_the_job_token(self):
+        mutation = """
+            mutation {
+                recordJobRun(job: "order_reminders", lastTimestamp: "2030-01-01T00:00:00Z") { jobState { job } }
+            }
+        """
+
+        def post(**headers):
+            response = self.client.post(
+                "/graphql", json.dumps({"query": mutation}), content_type="application/json", headers=headers
+            )
+            return response.json()
+
+        body = post()
+        self.assertIn("require staff access or the job token", body["errors"][0]["message"])
+        job = SimpleNamespace(job_access=True)
+        state = schema.execute('{ jobState(job: "order_reminders") { job } }', context_value=job)
+        self.assertIsNone(state.data["jobState"])
+        self.assertIn("errors", post(Authorization="Bearer wrong"))
+
+        with mock.patch("crm.jobs.JOB_TOKEN", "s3cret"):
+            self.assertIn("errors", post(Authorization="Bearer wrong"))
+            body = post(Authorization="Bearer s3cret")
+            self.assertEqual(body["data"]["recordJobRun"]["jobState"]["job"], "order_reminders")
+
+        staff = User.objects.create_user("staff", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        self.assertNotIn("errors", post())
+
+    def test_restock_only_checks_changed_products(self):
+        changed = Product.objects.create(name="Changed", price="1.00", stock=20)
+        untouched = Product.objects.create(name="Untouched", price="1.00", stock=20)
+        incremental_restock()
+
+        # Below the threshold without a write the watermark sees
+        earlier = timezone.now() - timedelta(hours=1)
+        Product.objects.filter(pk=untouched.pk).update(stock=2, updated_at=earlier)
+        Product.objects.filter(pk=changed.pk).update(stock=2, updated_at=timezone.now())
+
+        self.assertEqual([p.name for p in incremental_restock()], ["Changed"])
+        # A new threshold, or a full run, scans every product
+        self.assertEqual([p.name for p in incremental_restock(threshold=5)], ["Untouched"])
+
+    def test_reminders_start_after_the_watermark(self):
+        from crm.cron_jobs.send_order_reminders import JOB, reminder_window
+
+        class InProcessSession:
+            async def execute(self, request, variable_values):
+                result = await sync_to_async(graphql_execute)(
+                    schema.graphql_schema, request.document, variable_values=variable_values,
+                    context_value=SimpleNamespace(job_access=True),
+                )
+                return result.data
+
+        recorded = timezone.now() - timedelta(hours=2)
+        jobs.record_run(JOB, recorded)
+        jobs.record_run(JOB, recorded - timedelta(days=1))
+
+        since, until = async_to_sync(reminder_window)(InProcessSession())
+        self.assertEqual(since, recorded + timedelta(microseconds=1))
+        self.assertLess(until, timezone.now() - timedelta(seconds=59))
+
+        since, _ = async_to_sync(reminder_window)(InProcessSession(), full=True)
+        self.assertLess(since, timezone.now() - timedelta(days=6))
+
+    def test_reminders_script_needs_the_job_token(self):
+        from crm.cron_jobs import send_order_reminders
+
+        with mock.patch.object(send_order_reminders, "JOB_TOKEN", None):
+            with self.assertRaisesMessage(SystemExit, "CRM_JOB_TOKEN is not set"):
+                async_to_sync(send_order_reminders.main)()
+
+
+class DailySalesTests(TestCase):
+    def setUp(self):
+        self.alice = Customer.objects.create(name="Alice", email="alice@example.com")
+        self.bob = Customer.objects.create(name="Bob", email="bob@example.com")
+        self.pen = Product.objects.create(name="Pen", price=Decimal("2.00"), stock=100)
+        self.ink = Product.objects.create(name="Ink", price=Decimal("5.00"), stock=100)
+
+    def rollup(self):
+        days = list(DailySales.objects.values_list("date", "order_count", "revenue", "customer_count"))
+        units = dict(DailyProductSales.objects.values_list("product__name", "units"))
+        return days, units
+
+    def test_orders_are_rolled_up_as_they_are_placed(self):
+        place_order(self.alice, {self.pen.pk: 2, self.ink.pk: 1})
+        place_order(self.alice, {self.pen.pk: 1})
+        place_order(self.bob, {self.ink.pk: 3})
+
+        today = timezone.localdate()
+        live = self.rollup()
+        self.assertEqual(live, ([(today, 3, Decimal("26.00"), 2)], {"Pen": 3, "Ink": 4}))
+
+        self.assertEqual(rebuild_daily_sales(), 1)
+        self.assertEqual(self.rollup(), live)
+
+    def test_line_edits_and_deletions_recompute_the_day(self):
+        order = Order.objects.create(customer=self.alice)
+        order.products.add(self.pen, self.ink)
+        self.assertEqual(self.rollup()[0][0][1:], (1, Decimal("7.00"), 1))
+
+        order.products.remove(self.ink)
+        self.assertEqual(self.rollup(), ([(timezone.localdate(), 1, Decimal("2.00"), 1)], {"Pen": 1}))
+
+        self.pen.order_set.clear()
+        self.assertEqual(self.rollup()[1], {})
+
+        order.delete()
+        out = StringIO()
+        call_command("rebuild_daily_sales", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "Rebuilt daily sales for 0 days with orders")
+        self.assertEqual(self.rollup(), ([], {}))
+
+    def test_deleted_and_moved_orders_leave_their_day(self):
+        first = place_order(self.alice, {self.pen.pk: 5})
+        place_order(self.alice, {self.pen.pk: 2})
+        place_order(self.bob, {self.ink.pk: 1})
+        today = timezone.localdate()
+
+        first.delete()
+        self.assertEqual(self.rollup()[0], [(today, 2, Decimal("9.00"), 2)])
+
+        moved = Order.objects.get(customer=self.bob)
+        moved.order_date = timezone.now() - timedelta(days=40)
+        moved.save()
+        self.assertEqual(
+            sorted(self.rollup()[0]),
+            [(timezone.localdate(moved.order_date), 1, Decimal("5.00"), 1), (today, 1, Decimal("4.00"), 1)],
+        )
+
+        # Orders cascaded away with their customer
+        self.alice.delete()
+        self.bob.delete()
+        self.assertEqual(self.rollup()[0], [])
+        self.assertEqual(schema.execute("{ crmStats { orderCount revenue } }").data["crmStats"]["orderCount"], 0)
+
+    def test_stats_are_served_from_the_rollup_on_day_bounds(self):
+        place_order(self.alice, {self.pen.pk: 4})
+        midnight = sales.day_start(timezone.localdate())
+        query = """
+            query ($since: DateTime) {
+                crmStats(since: $since, groupBy: MONTH) { orderCount revenue buckets { period orderCount } }
+            }
+        """
+
+        for since, table in ((midnight, '"crm_dailysales"'), (midnight + timedelta(minutes=1), '"crm_order"')):
+            with CaptureQueriesContext(connection) as queries:
+                result = schema.execute(query, variables={"since": since.isoformat()})
+            self.assertIsNone(result.errors)
+            self.assertTrue(all(table in q["sql"] for q in queries if "crm_customer" not in q["sql"]))
+
+        stats = schema.execute(query, variables={"since": midnight.isoformat()}).data["crmStats"]
+        self.assertEqual((stats["orderCount"], Decimal(stats["revenue"])), (1, Decimal("8.00")))
+        month = sales.day_start(timezone.localdate().replace(day=1))
+        self.assertEqual(stats["buckets"], [{"period": month.isoformat(), "orderCount": 1}])
+
+
+class CeleryWorkflowTests(TestCase):
+    def setUp(self):
+        # Eager tasks retry in place; result.get() still raises their errors
+        conf = {"task_always_eager": True, "broker_url": "memory://"}
+        previous = {name: current_app.conf[name] for name in conf}
+        current_app.conf.update(conf)
+        self.addCleanup(current_app.conf.update, previous)
+
+        self.logs = self.enterContext(tempfile.TemporaryDirectory())
+        for name in ("BATCH_LOG", "REMINDERS_LOG"):
+            self.enterContext(mock.patch.object(tasks, name, os.path.join(self.logs, name)))
+        self.enterContext(mock.patch.object(tasks, "TASK_CHUNK_SIZE", 3))
+
+    def log(self, name):
+        with open(getattr(tasks, name)) as f:
+            return f.readlines()
+
+    def test_restock_chunks_run_once_per_run_id(self):
+        for i in range(7):
+            Product.objects.create(name=f"Low {i}", price="1.00", stock=i)
+        Product.objects.create(name="Stocked", price="1.00", stock=50)
+
+        result = tasks.restock_workflow(run_id="first").delay().get()
+        self.assertEqual(result, {"chunks": 3, "restocked": 7})
+        self.assertEqual(ChunkResult.objects.filter(key__startswith="restock:first:").count(), 3)
+        self.assertIn("restock run first: 3 chunks, restocked: 7", self.log("BATCH_LOG")[0])
+
+        # A redelivered chunk returns its recorded result without restocking again
+        self.assertEqual(tasks.restock_chunk.delay("restock:first:0-3", 0, 3, 100, 10).get(), {"restocked": 3})
+        self.assertEqual(sorted(Product.objects.values_list("stock", flat=True)), list(range(10, 17)) + [50])
+
+    def test_chunks_retry_after_database_errors(self):
+        Product.objects.create(name="Low", price="1.00", stock=1)
+        with mock.patch.object(
+            tasks, "restock_low_stock", side_effect=[OperationalError("database is locked"), [object()]]
+        ) as restock:
+            self.assertEqual(tasks.restock_workflow(run_id="retry").delay().get(), {"chunks": 1, "restocked": 1})
+        self.assertEqual(restock.call_count, 2)
+
+    def test_cleanup_and_recalculate_keep_the_rollup_current(self):
+        create_orders(4)
+        Order.objects.filter(customer__email__in=["c0@example.com", "c1@example.com"]).update(
+            order_date=timezone.now() - timedelta(days=400)
+        )
+        rebuild_daily_sales()
+
+        result = tasks.cleanup_workflow().delay().get()
+        self.assertEqual(result["crm.Customer"], 2)
+        self.assertEqual(result["crm.Order"], 2)
+        self.assertEqual(list(DailySales.objects.values_list("order_count", flat=True)), [2])
+
+        Order.objects.update(total_amount="0.00")
+        self.assertEqual(tasks.recalculate_workflow().delay().get(), {"chunks": 1, "orders": 2})
+        self.assertEqual(sales.totals(), {"order_count": 2, "revenue": Decimal("40.00")})
+
+    def test_reminders_send_one_per_customer_and_move_the_watermark(self):
+        create_orders(4)
+        customer = Customer.objects.first()
+        Order.objects.create(customer=customer, total_amount="5.00")
+        Order.objects.update(order_date=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(tasks.reminders_workflow().delay().get(), {"chunks": 2, "reminded": 4})
+        self.assertEqual(len(self.log("REMINDERS_LOG")), 4)
+        latest = Order.objects.filter(customer=customer).latest("id")
+        self.assertTrue(any(f"Order {latest.id}, Email: {customer.email}" in line for line in self.log("REMINDERS_LOG")))
+
+        self.assertEqual(tasks.reminders_workflow().delay().get(), {"chunks": 0})
+        self.assertEqual(tasks.reminders_workflow(full=True).delay().get()["reminded"], 4)
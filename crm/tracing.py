@@ -0,0 +1,181 @@
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+# Share of requests traced into the histogram; a request sending the trace
+# header is always traced and gets the trace back in extensions.tracing
+SAMPLE_RATE = getattr(settings, "CRM_TRACE_SAMPLE_RATE", 0.01)
+TRACE_HEADER = getattr(settings, "CRM_TRACE_HEADER", "X-CRM-Trace")
+
+# Upper bounds (ms) of the resolver duration buckets; the last one is +Inf
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+# --------------------------
+# Aggregation
+# --------------------------
+class FieldHistogram:
+    """Per-process duration histogram and SQL totals per ``Type.field``."""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._fields = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, field):
+        entry = self._fields.get(field)
+        if entry is None:
+            entry = self._fields[field] = {
+                "count": 0,
+                "duration_ms": 0.0,
+                "sql_count": 0,
+                "sql_ms": 0.0,
+                "buckets": [0] * (len(self.buckets) + 1),
+            }
+        return entry
+
+    def observe_many(self, observations):
+        """Record ``(field, duration_ms, sql_count, sql_ms)`` tuples under one lock."""
+        with self._lock:
+            for field, duration_ms, sql_count, sql_ms in observations:
+                entry = self._entry(field)
+                entry["count"] += 1
+                entry["duration_ms"] += duration_ms
+                entry["sql_count"] += sql_count
+                entry["sql_ms"] += sql_ms
+                entry["buckets"][bisect_left(self.buckets, duration_ms)] += 1
+
+    def clear(self):
+        with self._lock:
+            self._fields.clear()
+
+    def stats(self):
+        with self._lock:
+            fields = {
+                field: {**entry, "buckets": list(entry["buckets"])}
+                for field, entry in self._fields.items()
+            }
+        return {"buckets_ms": list(self.buckets), "fields": fields}
+
+
+field_histogram = FieldHistogram()
+
+
+# --------------------------
+# Per-request trace
+# --------------------------
+# (trace, resolver entry) started last in the current context. Root fields
+# resolved concurrently on the DB pool each run in a copy of the request's
+# context, so each charges its SQL to its own resolvers.
+_current_resolver = ContextVar("crm_current_resolver", default=(None, None))
+
+
+class Trace:
+    """
+    Resolver timings and SQL of one request, in the Apollo tracing shape.
+
+    Also a ``connection.execute_wrapper``: each query is charged to the
+    resolver that started last in the same context, which is also the
+    field whose queryset is evaluated while its list is completed after
+    the resolver returned.
+    """
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.start_time = timezone.now()
+        self.start = time.perf_counter_ns()
+        self.end = None
+        self.resolvers = []
+        self.sql_count = 0
+        self.sql_duration = 0
+        # Resolvers may run on several threads of the DB pool at once
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        trace, entry = _current_resolver.get()
+        return entry if trace is self else None
+
+    @current.setter
+    def current(self, entry):
+        _current_resolver.set((self, entry))
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            current = self.current
+            with self._lock:
+                self.sql_count += 1
+                self.sql_duration += elapsed
+                if current is not None:
+                    current["sqlCount"] += 1
+                    current["sqlDuration"] += elapsed
+
+    def add_resolver(self, entry):
+        with self._lock:
+            self.resolvers.append(entry)
+
+    def finish(self, histogram=field_histogram):
+        self.end = time.perf_counter_ns()
+        histogram.observe_many(
+            (
+                f"{r['parentType']}.{r['fieldName']}",
+                r["duration"] / 1e6,
+                r["sqlCount"],
+                r["sqlDuration"] / 1e6,
+            )
+            for r in self.resolvers
+        )
+
+    def as_extension(self):
+        duration = (self.end or time.perf_counter_ns()) - self.start
+        return {
+            "version": 1,
+            "startTime": self.start_time.isoformat(),
+            "endTime": (self.start_time + timedelta(microseconds=duration / 1000)).isoformat(),
+            "duration": duration,
+            "execution": {"resolvers": self.resolvers},
+            "sql": {"count": self.sql_count, "duration": self.sql_duration},
+        }
+
+
+def start_trace(request):
+    """Return a Trace when this request is traced, else None."""
+    if request.headers.get(TRACE_HEADER):
+        return Trace(verbose=True)
+    if SAMPLE_RATE and random.random() < SAMPLE_RATE:
+        return Trace()
+    return None
+
+
+class TracingMiddleware:
+    """Graphene middleware timing every resolver of a traced request."""
+
+    def resolve(self, next, root, info, **args):
+        trace = info.context.trace
+        start = time.perf_counter_ns()
+        entry = {
+            "path": info.path.as_list(),
+            "parentType": info.parent_type.name,
+            "fieldName": info.field_name,
+            "returnType": str(info.return_type),
+            "startOffset": start - trace.start,
+            "duration": 0,
+            "sqlCount": 0,
+            "sqlDuration": 0,
+        }
+        trace.current = entry
+        try:
+            return next(root, info, **args)
+        finally:
+            entry["duration"] = time.perf_counter_ns() - start
+            trace.add_resolver(entry)
@@ -1,3 +1,300 @@
-from django.shortcuts import render
+import json
+from contextlib import nullcontext
+from inspect import isawaitable
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils.text import compress_sequence
+from django.views.decorators.http import require_GET
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.utils.utils import set_rollback
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast, specified_rules,
+    validate_schema,
+)
+
+from .async_execution import ThreadedRootExecutionContext, run_in_db_thread
+from .catalogue import catalogue_stats
+from .complexity import QueryCostRule
+from .documents import document_cache, get_document
+from .exports import EXPORTS, FORMATS, export_lines, export_queryset
+from .loaders import Loaders
+from .tracing import TracingMiddleware, field_histogram, start_trace
+
+
+class CRMGraphQLView(GraphQLView):
+    """
+    GraphQL endpoint that gives every request its own batching loaders and
+    reuses parsed/validated documents across requests, including automatic
+    persisted queries sent as a sha256 hash only. Operations over the
+    depth/cost budgets are rejected during validation; the estimated cost
+    of executed operations is returned under ``extensions.cost``. Sampled
+    requests (or ones sending the trace header) are traced per resolver.
+    """
+
+    validation_rules = (*specified_rules, QueryCostRule)
+
+    def get_context(self, request):
+        request.loaders = Loaders()
+        return request
+
+    def get_middleware(self, request):
+        middleware = super().get_middleware(request)
+        # Untraced requests skip the per-resolver wrapper entirely
+        if getattr(request, "trace", None) is not None:
+            middleware = [*(middleware or []), TracingMiddleware()]
+        return middleware
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        extensions = data.get("extensions") or request.GET.get("extensions")
+        if not query and not extensions:
+            return super().execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+
+        schema = self.schema.graphql_schema
+
+        schema_validation_errors = validate_schema(schema)
+        if schema_validation_errors:
+            return ExecutionResult(data=None, errors=schema_validation_errors)
+
+        document, costs, errors = get_document(
+            schema,
+            query,
+            extensions,
+            self.validation_rules,
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+
+        if (
+            request.method.lower() == "get"
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+
+            raise HttpError(
+                HttpResponseNotAllowed(
+                    ["POST"],
+                    "Can only perform a {} operation from a POST request.".format(
+                        operation_ast.operation.value
+                    ),
+                )
+            )
+
+        try:
+            execute_options = {
+                "root_value": self.get_root_value(request),
+                "context_value": self.get_context(request),
+                "variable_values": variables,
+                "operation_name": operation_name,
+                "middleware": self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options["execution_context_class"] = self.execution_context_class
+
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+            else:
+                result = execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+        # Estimated once, when the document was cached
+        if operation_ast is None:
+            cost = {"cost": 0, "depth": 0}
+        else:
+            cost = costs[operation_ast.name.value if operation_ast.name else None]
+        if isawaitable(result):
+            return self._with_cost(result, cost)
+        result.extensions = {**(result.extensions or {}), "cost": cost}
+        return result
+
+    async def _with_cost(self, result, cost):
+        result = await result
+        result.extensions = {**(result.extensions or {}), "cost": cost}
+        return result
+
+    def get_response(self, request, data, show_graphiql=False):
+        # GraphQLView.get_response, also passing the result's extensions through
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+        trace = request.trace = start_trace(request)
+        with connection.execute_wrapper(trace) if trace else nullcontext():
+            execution_result = self.execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+        return self.build_response(request, execution_result, id, trace, show_graphiql)
+
+    def build_response(self, request, execution_result, id, trace, show_graphiql=False):
+        if trace:
+            trace.finish()
+            if trace.verbose and execution_result:
+                execution_result.extensions = {
+                    **(execution_result.extensions or {}),
+                    "tracing": trace.as_extension(),
+                }
+
+        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+            set_rollback()
+
+        status_code = 200
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                set_rollback()
+                response["errors"] = [self.format_error(e) for e in execution_result.errors]
+
+            if execution_result.errors and any(
+                not getattr(e, "path", None) for e in execution_result.errors
+            ):
+                status_code = 400
+            else:
+                response["data"] = execution_result.data
+
+            if execution_result.extensions:
+                response["extensions"] = execution_result.extensions
+
+            if self.batch:
+                response["id"] = id
+                response["status"] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+
+class AsyncCRMGraphQLView(CRMGraphQLView):
+    """
+    CRMGraphQLView as an async view for the ASGI stack. No request ever
+    blocks the event loop: preparation and mutations run on the bounded DB
+    thread pool, and the top-level fields of a query each resolve there
+    concurrently (see ThreadedRootExecutionContext). No GraphiQL or batching.
+    """
+
+    view_is_async = True
+    execution_context_class = ThreadedRootExecutionContext
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+
+            data = self.parse_body(request)
+            query, variables, operation_name, id = self.get_graphql_params(request, data)
+
+            trace = request.trace = start_trace(request)
+            execution_result = await run_in_db_thread(self.execute_graphql_request, trace)(
+                request, data, query, variables, operation_name
+            )
+            if isawaitable(execution_result):
+                execution_result = await execution_result
+
+            result, status_code = self.build_response(request, execution_result, id, trace)
+            return HttpResponse(status=status_code, content=result, content_type="application/json")
+
+        except HttpError as e:
+            response = e.response
+            response["Content-Type"] = "application/json"
+            response.content = self.json_encode(request, {"errors": [self.format_error(e)]})
+            return response
+
+async def graphql_subscriptions(request):
+    """
+    Run a GraphQL subscription (``?query=...&variables=...``) and stream
+    each result as a server-sent ``next`` event, for EventSource clients.
+    Serve it under ASGI: the response stays open until the client leaves.
+    """
+    try:
+        variables = json.loads(request.GET.get("variables") or "null")
+    except ValueError:
+        return JsonResponse({"errors": [{"message": "Variables are invalid JSON."}]}, status=400)
+
+    result = await graphene_settings.SCHEMA.subscribe(
+        request.GET.get("query") or "", variable_values=variables, context_value=request
+    )
+    if isinstance(result, ExecutionResult):
+        return JsonResponse({"errors": [GraphQLView.format_error(e) for e in result.errors]}, status=400)
+
+    async def events():
+        async for item in result:
+            yield f"event: next\ndata: {json.dumps(item.formatted, cls=DjangoJSONEncoder)}\n\n"
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def graphql_stats(request):
+    """Expose the cache counters and the resolver histogram for monitoring."""
+    return JsonResponse({
+        "document_cache": document_cache.stats(),
+        "product_cache": catalogue_stats.stats(),
+        "resolvers": field_histogram.stats(),
+    })
+
+
+async def _iterate_in_thread(content):
+    """
+    Async iterator over the synchronous ``content``, each chunk pulled in
+    the request's sync thread: Django reads a synchronous streaming body
+    into memory before sending it under ASGI.
+    """
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(content, None)) is not None:
+        yield chunk
+
+
+@require_GET
+def export(request, resource, fmt):
+    """
+    Stream customers or orders as CSV or NDJSON (``?gzip=1`` to compress),
+    filtered with the same arguments as the GraphQL list fields.
+    """
+    if resource not in EXPORTS or fmt not in FORMATS:
+        raise Http404(f"No export for {resource}.{fmt}")
+    try:
+        header, rows = export_queryset(resource, request.GET)
+    except GraphQLError as e:
+        return JsonResponse({"error": e.message}, status=400)
+
+    content = (chunk.encode() for chunk in export_lines(fmt, header, rows))
+    filename, content_type = f"{resource}.{fmt}", FORMATS[fmt]
+    if request.GET.get("gzip") in ("1", "true"):
+        content = compress_sequence(content)
+        filename, content_type = f"{filename}.gz", "application/gzip"
+    if isinstance(request, ASGIRequest):
+        content = _iterate_in_thread(content)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
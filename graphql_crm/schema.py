@@ -1,9 +1,24 @@
 import re
+from datetime import datetime
 import graphene
 from graphene_django import DjangoObjectType
+from graphql import GraphQLError
 from django.db import transaction
-from django.utils import timezone
-from .models import Customer, Product, Order
+from crm import events, jobs
+from crm.bulk import DUPLICATE_EMAIL, bulk_create_customers
+from crm.catalogue import cached_products
+from crm.filters import (
+    CUSTOMER_FILTERS, ORDER_FILTERS, PRODUCT_FILTERS, apply_filters, filter_args, limit_list,
+)
+from crm.loaders import get_loaders
+from crm.optimizer import optimize_queryset
+from crm.stats import crm_stats
+from crm.stock import incremental_restock
+from crm.pagination import CountableConnection, connection_args, keyset_connection
+from crm.models import Customer, JobState, Product, Order, OrderItem
+from crm.orders import order_quantities, place_order
+
+PHONE_RE = re.compile(r"^\+?\d{1,4}?[-.\s]?\(?\d{1,3}?\)?[-.\s]?\d{3}[-.\s]?\d{4}$")
 
 # --------------------
 # GraphQL Types
@@ -18,10 +33,74 @@ class ProductType(DjangoObjectType):
         model = Product
         fields = ("id", "name", "price", "stock")
 
+class OrderItemType(DjangoObjectType):
+    class Meta:
+        model = OrderItem
+        fields = ("id", "product", "quantity", "unit_price")
+
 class OrderType(DjangoObjectType):
     class Meta:
         model = Order
-        fields = ("id", "customer", "products", "total_amount", "order_date")
+        fields = ("id", "customer", "products", "items", "total_amount", "order_date")
+
+    def resolve_customer(self, info):
+        if Order.customer.is_cached(self):
+            return self.customer
+        return get_loaders(info.context).customer.load(self.customer_id)
+
+    def resolve_products(self, info):
+        if "products" in getattr(self, "_prefetched_objects_cache", {}):
+            return list(self.products.all())
+        return get_loaders(info.context).products_for_order(self.pk)
+
+class CustomerConnection(CountableConnection):
+    class Meta:
+        node = CustomerType
+
+class ProductConnection(CountableConnection):
+    class Meta:
+        node = ProductType
+
+class OrderConnection(CountableConnection):
+    class Meta:
+        node = OrderType
+
+class JobStateType(DjangoObjectType):
+    class Meta:
+        model = JobState
+        fields = ("job", "last_id", "last_timestamp", "updated_at")
+
+class StatsGrouping(graphene.Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+class StatsBucketType(graphene.ObjectType):
+    period = graphene.DateTime()
+    order_count = graphene.Int()
+    revenue = graphene.Decimal()
+
+class CrmStatsType(graphene.ObjectType):
+    customer_count = graphene.Int()
+    order_count = graphene.Int()
+    revenue = graphene.Decimal()
+    buckets = graphene.List(StatsBucketType)
+
+# Subscription payloads are the published messages, not model rows, so
+# delivering an event never touches the database
+class OrderEventType(graphene.ObjectType):
+    id = graphene.ID()
+    customer_id = graphene.ID()
+    total_amount = graphene.Decimal()
+    order_date = graphene.DateTime()
+
+    def resolve_order_date(root, info):
+        return datetime.fromisoformat(root["order_date"])
+
+class StockEventType(graphene.ObjectType):
+    id = graphene.ID()
+    name = graphene.String()
+    stock = graphene.Int()
 
 # --------------------
 # Mutations
@@ -41,7 +120,7 @@ class CreateCustomer(graphene.Mutation):
             raise Exception("Email already exists")
 
         # Validate phone format
-        if phone and not re.match(r"^\+?\d{1,4}?[-.\s]?\(?\d{1,3}?\)?[-.\s]?\d{3}[-.\s]?\d{4}$", phone):
+        if phone and not PHONE_RE.match(phone):
             raise Exception("Invalid phone format")
 
         customer = Customer.objects.create(name=name, email=email, phone=phone)
@@ -56,34 +135,37 @@ class BulkCreateCustomers(graphene.Mutation):
 
     @transaction.atomic
     def mutate(self, info, input):
-        created_customers = []
-        errors = []
+        rows = []
+        errors = []  # (input position, message), reported in input order
 
-        for data in input:
+        for index, data in enumerate(input):
+            if not isinstance(data, dict):
+                errors.append((index, f"Invalid customer: expected an object, got {type(data).__name__}"))
+                continue
             try:
-                name = data["name"]
-                email = data["email"]
-                phone = data.get("phone")
-
-                if Customer.objects.filter(email=email).exists():
-                    errors.append(f"Email already exists: {email}")
-                    continue
-
-                if phone and not re.match(r"^\+?\d{1,4}?[-.\s]?\(?\d{1,3}?\)?[-.\s]?\d{3}[-.\s]?\d{4}$", phone):
-                    errors.append(f"Invalid phone format: {phone}")
-                    continue
-
-                cust = Customer(name=name, email=email, phone=phone)
-                cust.save()
-                created_customers.append(cust)
-
+                row = {
+                    "index": index, "name": data["name"], "email": data["email"], "phone": data.get("phone"),
+                }
             except KeyError as e:
-                errors.append(f"Missing field: {e}")
-
-            except Exception as e:
-                errors.append(str(e))
-
-        return BulkCreateCustomers(customers=created_customers, errors=errors)
+                errors.append((index, f"Missing field: {e}"))
+                continue
+            invalid = [field for field in ("name", "email") if not isinstance(row[field], str)]
+            if row["phone"] is not None and not isinstance(row["phone"], str):
+                invalid.append("phone")
+            if invalid:
+                errors.append((index, f"Invalid field: '{invalid[0]}' must be a string"))
+                continue
+            rows.append(row)
+
+        created_customers, rejected = bulk_create_customers(rows, PHONE_RE)
+        for row, reason in rejected:
+            if reason == DUPLICATE_EMAIL:
+                errors.append((row["index"], f"Email already exists: {row['email']}"))
+            else:
+                errors.append((row["index"], f"Invalid phone format: {row['phone']}"))
+
+        errors.sort(key=lambda error: error[0])
+        return BulkCreateCustomers(customers=created_customers, errors=[message for _, message in errors])
 
 class CreateProduct(graphene.Mutation):
     class Arguments:
@@ -102,38 +184,87 @@ class CreateProduct(graphene.Mutation):
         product = Product.objects.create(name=name, price=price, stock=stock)
         return CreateProduct(product=product)
 
+class OrderItemInput(graphene.InputObjectType):
+    product_id = graphene.ID(required=True)
+    quantity = graphene.Int(required=True)
+
 class CreateOrder(graphene.Mutation):
     class Arguments:
         customer_id = graphene.ID(required=True)
-        product_ids = graphene.List(graphene.ID, required=True)
+        product_ids = graphene.List(graphene.ID)
+        items = graphene.List(OrderItemInput)
         order_date = graphene.DateTime()
 
     order = graphene.Field(OrderType)
 
-    def mutate(self, info, customer_id, product_ids, order_date=None):
+    def mutate(self, info, customer_id, product_ids=None, items=None, order_date=None):
         try:
             customer = Customer.objects.get(pk=customer_id)
         except Customer.DoesNotExist:
             raise Exception("Invalid customer ID")
 
-        products = Product.objects.filter(pk__in=product_ids)
-        if len(products) != len(product_ids):
-            raise Exception("One or more product IDs are invalid")
-
-        if not products:
+        quantities = order_quantities(product_ids, items)
+        if not quantities:
             raise Exception("At least one product must be selected")
 
-        order = Order.objects.create(
-            customer=customer,
-            order_date=order_date or timezone.now()
-        )
-        order.products.set(products)
-        total = sum([p.price for p in products])
-        order.total_amount = total
-        order.save()
+        # Stock is reserved and prices read for every line in the same transaction
+        order = place_order(customer, quantities, order_date)
 
         return CreateOrder(order=order)
 
+class UpdateLowStockProducts(graphene.Mutation):
+    class Arguments:
+        threshold = graphene.Int(default_value=10)
+        increment = graphene.Int(default_value=10)
+        # Only products changed since the previous run
+        incremental = graphene.Boolean(default_value=False)
+
+    success = graphene.String()
+    products = graphene.List(ProductType)
+
+    def mutate(self, info, threshold, increment, incremental):
+        if threshold < 0:
+            raise Exception("Threshold cannot be negative")
+        if increment <= 0:
+            raise Exception("Increment must be positive")
+
+        products = incremental_restock(threshold=threshold, increment=increment, full=not incremental)
+        return UpdateLowStockProducts(
+            success="Low stock products updated successfully!",
+            products=products,
+        )
+
+def require_job_access(info):
+    """Job control (reports, watermarks) is for the jobs themselves and staff."""
+    if not jobs.has_job_access(info.context):
+        raise GraphQLError("Job operations require staff access or the job token.")
+
+# Folds the customers created since the last run into the report totals; orders
+# are summed from the DailySales rollup. ``full`` rebuilds both.
+class UpdateCrmReport(graphene.Mutation):
+    class Arguments:
+        full = graphene.Boolean(default_value=False)
+
+    customer_count = graphene.Int()
+    order_count = graphene.Int()
+    revenue = graphene.Decimal()
+
+    def mutate(self, info, full):
+        require_job_access(info)
+        return UpdateCrmReport(**jobs.crm_report(full=full))
+
+# Advances the timestamp watermark of a job running outside the server
+class RecordJobRun(graphene.Mutation):
+    class Arguments:
+        job = graphene.String(required=True)
+        last_timestamp = graphene.DateTime(required=True)
+
+    job_state = graphene.Field(JobStateType)
+
+    def mutate(self, info, job, last_timestamp):
+        require_job_access(info)
+        return RecordJobRun(job_state=jobs.record_run(job, last_timestamp))
+
 # --------------------
 # Root Schema
 # --------------------
@@ -142,17 +273,83 @@ class Mutation(graphene.ObjectType):
     bulk_create_customers = BulkCreateCustomers.Field()
     create_product = CreateProduct.Field()
     create_order = CreateOrder.Field()
+    update_low_stock_products = UpdateLowStockProducts.Field()
+    update_crm_report = UpdateCrmReport.Field()
+    record_job_run = RecordJobRun.Field()
 
 class Query(graphene.ObjectType):
-    customers = graphene.List(CustomerType)
-    products = graphene.List(ProductType)
-    orders = graphene.List(OrderType)
+    customers = graphene.List(CustomerType, **filter_args(CUSTOMER_FILTERS))
+    products = graphene.List(ProductType, **filter_args(PRODUCT_FILTERS))
+    orders = graphene.List(OrderType, **filter_args(ORDER_FILTERS))
+
+    crm_stats = graphene.Field(
+        CrmStatsType,
+        since=graphene.DateTime(),
+        until=graphene.DateTime(),
+        group_by=StatsGrouping(),
+    )
+    job_state = graphene.Field(JobStateType, job=graphene.String(required=True))
+
+    # Keyset-paginated connections
+    all_customers = graphene.Field(CustomerConnection, **filter_args(CUSTOMER_FILTERS), **connection_args())
+    all_products = graphene.Field(ProductConnection, **filter_args(PRODUCT_FILTERS), **connection_args())
+    all_orders = graphene.Field(OrderConnection, **filter_args(ORDER_FILTERS), **connection_args())
+
+    def resolve_customers(root, info, **filters):
+        customers = apply_filters(Customer.objects.all(), CUSTOMER_FILTERS, filters)
+        return limit_list(optimize_queryset(customers, info))
+
+    def resolve_products(root, info, **filters):
+        def load():
+            return limit_list(apply_filters(Product.objects.all(), PRODUCT_FILTERS, filters))
+
+        # Whole rows are cached, so one entry serves every selection set
+        return cached_products("list", filters, load)
+
+    def resolve_orders(root, info, **filters):
+        orders = apply_filters(Order.objects.all(), ORDER_FILTERS, filters)
+        return limit_list(optimize_queryset(orders, info))
+
+    def resolve_crm_stats(root, info, since=None, until=None, group_by=None):
+        return crm_stats(since=since, until=until, group_by=group_by and group_by.value)
+
+    def resolve_job_state(root, info, job):
+        require_job_access(info)
+        return JobState.objects.filter(job=job).first()
+
+    def resolve_all_customers(root, info, first=None, after=None, **filters):
+        customers = apply_filters(Customer.objects.all(), CUSTOMER_FILTERS, filters)
+        return keyset_connection(CustomerConnection, customers, info, first=first, after=after)
+
+    def resolve_all_products(root, info, first=None, after=None, **filters):
+        products = apply_filters(Product.objects.all(), PRODUCT_FILTERS, filters)
+        return keyset_connection(ProductConnection, products, info, first=first, after=after)
+
+    def resolve_all_orders(root, info, first=None, after=None, **filters):
+        orders = apply_filters(Order.objects.all(), ORDER_FILTERS, filters)
+        return keyset_connection(
+            OrderConnection, orders, info,
+            ordering=("order_date", "id"), first=first, after=after,
+        )
+
+class Subscription(graphene.ObjectType):
+    order_created = graphene.Field(OrderEventType)
+    stock_below_threshold = graphene.Field(
+        StockEventType, threshold=graphene.Int(default_value=events.LOW_STOCK_THRESHOLD)
+    )
+
+    async def subscribe_order_created(root, info):
+        async for message in events.broker.subscribe(events.ORDER_CREATED):
+            yield message
 
-    def resolve_customers(root, info):
-        return Customer.objects.all()
+    def subscribe_stock_below_threshold(root, info, threshold):
+        # Checked before the stream starts so the error is the subscription's result
+        if threshold > events.LOW_STOCK_THRESHOLD:
+            raise Exception(f"Threshold cannot be above {events.LOW_STOCK_THRESHOLD}")
 
-    def resolve_products(root, info):
-        return Product.objects.all()
+        async def low_stock():
+            async for message in events.broker.subscribe(events.STOCK_BELOW_THRESHOLD):
+                if message["stock"] < threshold:
+                    yield message
 
-    def resolve_orders(root, info):
-        return Order.objects.all()
+        return low_stock()